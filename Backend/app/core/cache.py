@@ -0,0 +1,77 @@
+from collections import OrderedDict
+import secrets
+from threading import Lock
+import time
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store `value`; `ttl` may shorten (never extend) the cache-wide TTL."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class VersionStamps:
+    """Per-key change counters, for ETags that cost no query to compute.
+
+    Counters live in this process: a random per-process prefix keeps tags
+    from different workers or restarts from ever matching, and every tag
+    also rolls over each `ttl` seconds, which bounds how long a change made
+    by another worker can hide behind a 304.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._prefix = secrets.token_hex(4)
+        self._versions: dict = {}
+        self._lock = Lock()
+
+    def bump(self, key: Hashable):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def etag(self, key: Hashable, *extra: Any) -> str:
+        epoch = int(time.time() // self.ttl)
+        parts = [self._prefix, str(self._versions.get(key, 0)), str(epoch), *map(str, extra)]
+        return '"' + "-".join(parts) + '"'
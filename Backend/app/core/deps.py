@@ -1,8 +1,14 @@
+import hashlib
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.db.session import get_db
 from app.models import User
@@ -10,8 +16,57 @@ from app.schemas import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def get_current_user(
-    db: Session = Depends(get_db),
+# Decoded tokens keyed by SHA-256 of the token, and detached User rows keyed by id.
+# Other workers only see user changes once their entry expires.
+token_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_TOKENS, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_USERS, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.pop(user_id)
+
+# Session.info key: ids of users changed in the session's transaction
+_CHANGED_USERS = "changed_user_ids"
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    # Evict again once the change is visible: a request that read the old
+    # row between the flush and the commit may have cached it meanwhile
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_changed_users(session, previous_transaction):
+    session.info.pop(_CHANGED_USERS, None)
+
+def decode_token(token: str) -> TokenData:
+    """Decode and validate a JWT, reusing earlier decodes of the same token."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
+
+    payload = jwt.decode(
+        token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+    user_id: int = payload.get("sub")
+    if user_id is None:
+        raise JWTError("Token has no subject")
+    token_data = TokenData(user_id=user_id, is_admin=payload.get("is_admin", False))
+    # Never serve a token from the cache past its own expiry
+    expires_in = payload["exp"] - time.time() if "exp" in payload else None
+    token_cache.set(key, token_data, ttl=expires_in)
+    return token_data
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     credentials_exception = HTTPException(
@@ -20,27 +75,28 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id, is_admin=payload.get("is_admin", False))
+        token_data = decode_token(token)
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+
+    user = user_cache.get(token_data.user_id)
+    if user is not None:
+        return user
+
+    user = await db.get(User, token_data.user_id)
     if user is None:
         raise credentials_exception
+    # Detach so the cached row can be shared across requests
+    db.expunge(user)
+    user_cache.set(user.id, user)
     return user
 
-def get_current_active_user(
+async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
     return current_user
 
-def get_current_admin_user(
+async def get_current_admin_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
     if not current_user.is_admin:
@@ -0,0 +1,84 @@
+"""Minimal iCalendar (RFC 5545) serialization for the reservation feeds.
+
+Reservation times are stored without a timezone, so they are written as
+floating local times; only DTSTAMP, which comes from a UTC timestamp, is
+marked as UTC.
+"""
+from datetime import datetime
+from typing import Optional
+
+CRLF = "\r\n"
+MAX_LINE_OCTETS = 75
+
+
+def escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def format_datetime(dt: datetime, utc: bool = False) -> str:
+    return dt.strftime("%Y%m%dT%H%M%S") + ("Z" if utc else "")
+
+
+def content_line(name: str, value: str) -> str:
+    """`name:value`, folded into continuation lines of at most 75 octets."""
+    line = f"{name}:{value}"
+    if len(line.encode()) <= MAX_LINE_OCTETS:
+        return line + CRLF
+    parts, current, size = [], "", 0
+    for char in line:
+        char_size = len(char.encode())
+        # continuation lines start with a space, which counts towards the limit
+        if size + char_size > MAX_LINE_OCTETS - (1 if parts else 0):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += char_size
+    parts.append(current)
+    return (CRLF + " ").join(parts) + CRLF
+
+
+def calendar_header(name: str) -> str:
+    return (
+        content_line("BEGIN", "VCALENDAR")
+        + content_line("VERSION", "2.0")
+        + content_line("PRODID", "-//Hall Reservation System//EN")
+        + content_line("CALSCALE", "GREGORIAN")
+        + content_line("X-WR-CALNAME", escape_text(name))
+    )
+
+
+CALENDAR_FOOTER = content_line("END", "VCALENDAR")
+
+
+def vevent(
+    uid: str,
+    start: datetime,
+    end: datetime,
+    summary: str,
+    stamp: datetime,
+    location: Optional[str] = None,
+    description: Optional[str] = None,
+    status: Optional[str] = None,
+) -> str:
+    lines = [
+        content_line("BEGIN", "VEVENT"),
+        content_line("UID", uid),
+        content_line("DTSTAMP", format_datetime(stamp, utc=True)),
+        content_line("DTSTART", format_datetime(start)),
+        content_line("DTEND", format_datetime(end)),
+        content_line("SUMMARY", escape_text(summary)),
+    ]
+    if location:
+        lines.append(content_line("LOCATION", escape_text(location)))
+    if description:
+        lines.append(content_line("DESCRIPTION", escape_text(description)))
+    if status:
+        lines.append(content_line("STATUS", status))
+    lines.append(content_line("END", "VEVENT"))
+    return "".join(lines)
@@ -0,0 +1,239 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from threading import Lock
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def normalize_dt(value: datetime) -> datetime:
+    """Drop tzinfo so request datetimes compare with the naive values stored in the DB."""
+    if value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+class _HallIntervals:
+    """Approved intervals of one hall, kept sorted by start time."""
+
+    def __init__(self):
+        self.entries: List[Tuple[datetime, datetime, int]] = []
+        self.max_span = timedelta(0)
+        # entries per span, so max_span can shrink again when the longest go
+        self._spans: Dict[timedelta, int] = {}
+
+    def add(self, start: datetime, end: datetime, reservation_id: int):
+        insort(self.entries, (start, end, reservation_id))
+        span = end - start
+        self._spans[span] = self._spans.get(span, 0) + 1
+        if span > self.max_span:
+            self.max_span = span
+
+    def remove(self, start: datetime, end: datetime, reservation_id: int):
+        i = bisect_left(self.entries, (start, end, reservation_id))
+        if i < len(self.entries) and self.entries[i][2] == reservation_id:
+            del self.entries[i]
+            span = end - start
+            self._spans[span] -= 1
+            if not self._spans[span]:
+                del self._spans[span]
+                if span == self.max_span:
+                    self.max_span = max(self._spans, default=timedelta(0))
+
+    def overlapping(self, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> List[int]:
+        # Every interval starting before `end` is a candidate; none of them can
+        # reach past `start` if it began more than `max_span` earlier.
+        hi = bisect_left(self.entries, (end,))
+        lowest_start = start - self.max_span
+        found = []
+        i = hi - 1
+        while i >= 0 and self.entries[i][0] >= lowest_start:
+            entry_start, entry_end, reservation_id = self.entries[i]
+            if entry_end > start and reservation_id != exclude_id:
+                found.append(reservation_id)
+            i -= 1
+        found.reverse()
+        return found
+
+
+class HallIntervalIndex:
+    """In-process index of APPROVED reservation intervals per hall.
+
+    Answers overlap queries with a binary search instead of a range scan on
+    `reservations`. The index is per worker process, so write paths must still
+    confirm against the database before committing.
+
+    A load may hold only the intervals ending after a `horizon`; `covers()`
+    tells whether a query can be answered from it. Adds and discards made
+    while a load's query runs are journaled and replayed onto its result, so
+    a reload never drops them.
+    """
+
+    def __init__(self):
+        self._halls: Dict[int, _HallIntervals] = {}
+        self._by_id: Dict[int, Tuple[int, datetime, datetime]] = {}
+        self._lock = Lock()
+        self._generation = 0
+        self._journal: Optional[List[Tuple]] = None
+        self.horizon: Optional[datetime] = None
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def begin_load(self) -> int:
+        """Start journaling changes for a load; call before querying its rows."""
+        with self._lock:
+            self._generation += 1
+            self._journal = []
+            return self._generation
+
+    def cancel_load(self, generation: int):
+        with self._lock:
+            if generation == self._generation:
+                self._journal = None
+
+    def load(
+        self,
+        rows: Iterable[Tuple[int, int, datetime, datetime]],
+        horizon: Optional[datetime] = None,
+        generation: Optional[int] = None,
+    ):
+        """Replace the index contents with (reservation_id, hall_id, start, end) rows.
+
+        `horizon`: the rows are all intervals ending after it. `generation`
+        comes from begin_load(); changes journaled since then are replayed,
+        and a load superseded by a newer begin_load() is dropped.
+        """
+        halls: Dict[int, _HallIntervals] = {}
+        by_id = {}
+        for reservation_id, hall_id, start, end in rows:
+            halls.setdefault(hall_id, _HallIntervals()).add(start, end, reservation_id)
+            by_id[reservation_id] = (hall_id, start, end)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            journal, self._journal = self._journal or [], None
+            self._halls = halls
+            self._by_id = by_id
+            for change in journal:
+                if len(change) == 1:
+                    self._discard(*change)
+                else:
+                    self._add(*change)
+            self.horizon = horizon
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        return not self.loaded or time.monotonic() - self.loaded_at > max_age_seconds
+
+    def covers(self, start: datetime) -> bool:
+        """Whether every interval overlapping one that starts at `start` is in the index."""
+        return self.loaded and (self.horizon is None or start >= self.horizon)
+
+    def add(self, reservation_id: int, hall_id: int, start: datetime, end: datetime):
+        with self._lock:
+            self._add(reservation_id, hall_id, start, end)
+            if self._journal is not None:
+                self._journal.append((reservation_id, hall_id, start, end))
+
+    def discard(self, reservation_id: int):
+        with self._lock:
+            self._discard(reservation_id)
+            if self._journal is not None:
+                self._journal.append((reservation_id,))
+
+    def _add(self, reservation_id: int, hall_id: int, start: datetime, end: datetime):
+        self._discard(reservation_id)
+        self._halls.setdefault(hall_id, _HallIntervals()).add(start, end, reservation_id)
+        self._by_id[reservation_id] = (hall_id, start, end)
+
+    def _discard(self, reservation_id: int):
+        entry = self._by_id.pop(reservation_id, None)
+        if entry is None:
+            return
+        hall_id, start, end = entry
+        intervals = self._halls.get(hall_id)
+        if intervals is not None:
+            intervals.remove(start, end, reservation_id)
+
+    def find_overlaps(self, hall_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> List[int]:
+        """Return ids of approved reservations in `hall_id` overlapping [start, end)."""
+        with self._lock:
+            intervals = self._halls.get(hall_id)
+            if intervals is None:
+                return []
+            return intervals.overlapping(start, end, exclude_id)
+
+    def is_overlapping(self, hall_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> bool:
+        return bool(self.find_overlaps(hall_id, start, end, exclude_id))
+
+
+approved_index = HallIntervalIndex()
+
+
+def sweep_conflicts(
+    intervals: Iterable[Tuple[datetime, datetime, int]],
+    slots: List[Tuple[datetime, datetime]],
+) -> List[List[int]]:
+    """For each (start, end) slot, return the ids of intervals overlapping it.
+
+    One pass over both lists sorted by start time; results are returned in the
+    order of `slots`.
+    """
+    pending = sorted(intervals)
+    order = sorted(range(len(slots)), key=lambda i: slots[i][0])
+    results: List[List[int]] = [[] for _ in slots]
+    active: List[Tuple[datetime, datetime, int]] = []
+    next_interval = 0
+    for i in order:
+        slot_start, slot_end = slots[i]
+        while next_interval < len(pending) and pending[next_interval][0] < slot_end:
+            active.append(pending[next_interval])
+            next_interval += 1
+        # Slots come in start order, so anything ending before this one starts is done for good.
+        active = [entry for entry in active if entry[1] > slot_start]
+        results[i] = [entry[2] for entry in active if entry[0] < slot_end]
+    return results
+
+
+def merge_intervals(intervals: Iterable[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Merge overlapping or touching (start, end) intervals into disjoint ones."""
+    merged: List[Tuple[datetime, datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _align_up(value: datetime, step: timedelta) -> datetime:
+    offset = (value - datetime.min) % step
+    return value if not offset else value + (step - offset)
+
+
+def free_gaps(
+    busy: Iterable[Tuple[datetime, datetime]],
+    window_start: datetime,
+    window_end: datetime,
+    duration: timedelta,
+    granularity: timedelta,
+) -> List[Tuple[datetime, datetime]]:
+    """Return the free gaps of [window_start, window_end) that fit `duration`.
+
+    Gap starts are rounded up to a multiple of `granularity` (counted from
+    midnight), so every returned gap can be booked from its start.
+    """
+    gaps = []
+    cursor = window_start
+    for start, end in merge_intervals(busy) + [(window_end, window_end)]:
+        if start > cursor:
+            gap_start = _align_up(cursor, granularity)
+            gap_end = min(start, window_end)
+            if gap_end - gap_start >= duration:
+                gaps.append((gap_start, gap_end))
+        if end > cursor:
+            cursor = end
+        if cursor >= window_end:
+            break
+    return gaps
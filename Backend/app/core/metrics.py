@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond up to the default pool timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Monotonic in-process counter."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Gauge:
+    """In-process value that goes up and down."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: int = 1):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed values (seconds)."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        """Cumulative bucket counts keyed by upper bound, plus count and sum."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": count, "sum": total}
+
+
+class Family:
+    """Metrics of one kind keyed by label values, created on first use.
+
+    Label values must come from a bounded set (route templates, not paths).
+    """
+
+    def __init__(self, labelnames: Sequence[str], factory: Callable = Counter):
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def items(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.labelnames, values)), child) for values, child in sorted(children)]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels.items()) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Exposition:
+    """Collects metrics in the Prometheus text format (version 0.0.4)."""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def _header(self, name: str, kind: str, help: str):
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def add(self, name: str, kind: str, help: str, samples: Iterable[Tuple[Dict[str, str], float]]):
+        """Add a counter or gauge; `samples` are (labels, value) pairs."""
+        self._header(name, kind, help)
+        for labels, value in samples:
+            self._lines.append(f"{name}{_labels(labels)} {value}")
+
+    def add_histogram(self, name: str, help: str, samples: Iterable[Tuple[Dict[str, str], Dict]]):
+        """Add a histogram; `samples` are (labels, Histogram.snapshot()) pairs."""
+        self._header(name, "histogram", help)
+        for labels, snapshot in samples:
+            for bound, count in snapshot["buckets"].items():
+                self._lines.append(f"{name}_bucket{_labels(labels, ('le', bound))} {count}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+            self._lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+
+    def add_family(self, name: str, kind: str, help: str, family: Family):
+        if kind == "histogram":
+            self.add_histogram(name, help, [(labels, child.snapshot()) for labels, child in family.items()])
+        else:
+            self.add(name, kind, help, [(labels, child.value) for labels, child in family.items()])
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
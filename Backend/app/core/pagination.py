@@ -0,0 +1,66 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe encoding of the sort key of the last row on a
+page; the next page starts strictly after it. Unlike OFFSET, every page costs
+the same, and rows inserted meanwhile do not shift later pages.
+"""
+import base64
+from datetime import datetime
+import json
+from typing import Any, List, Optional, Sequence
+
+from fastapi import Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Decode `cursor` into values typed like `columns`; raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if column.type.python_type is datetime else column.type.python_type(v)
+            for column, v in zip(columns, raw)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+
+def _after(columns: Sequence, values: Sequence, descending: bool):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), which MySQL can
+    # satisfy with a range scan on the composite index
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def paginate(query, columns: Sequence, cursor: Optional[str] = None, descending: bool = True):
+    """Order `query` by `columns` and, if given a cursor, continue after it."""
+    if cursor:
+        query = query.where(_after(columns, decode_cursor(cursor, columns), descending))
+    return query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+
+
+def next_cursor(items: Sequence, limit: int, columns: Sequence) -> Optional[str]:
+    """Cursor for the page after `items`, or None when this was the last page."""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, column.key) for column in columns])
+
+
+def set_next_cursor(response: Response, items: Sequence, limit: int, columns: Sequence) -> None:
+    cursor = next_cursor(items, limit, columns)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
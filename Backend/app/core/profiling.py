@@ -0,0 +1,113 @@
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .telemetry import route_template
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# IN lists are expanded to one placeholder per value
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """`statement` with literals and IN lists replaced, so repeats of it compare equal."""
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+
+class QueryProfile:
+    """Statements one request ran, and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[normalize_statement(statement)] += 1
+
+    def server_timing(self) -> str:
+        queries = "query" if self.count == 1 else "queries"
+        return f'db;dur={self.seconds * 1000:.3f};desc="{self.count} {queries}"'
+
+
+_current_profile: contextvars.ContextVar[Optional[QueryProfile]] = contextvars.ContextVar(
+    "current_query_profile", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def profile_engine(engine: Engine):
+    """Attribute `engine`'s statements to the request running them (pass AsyncEngine.sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLProfilingMiddleware:
+    """Reports each request's query count and DB time in a Server-Timing header.
+
+    Logs a warning when one normalized statement ran more than
+    `repeat_threshold` times in a request, the signature of a per-row lookup
+    (N+1). Statements a streamed response runs after its headers went out
+    are left out of the header but not of the check.
+    """
+
+    def __init__(self, app: ASGIApp, repeat_threshold: int = 10):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            self._check_repeats(scope, profile)
+
+    def _check_repeats(self, scope: Scope, profile: QueryProfile):
+        for statement, count in profile.statements.most_common():
+            if count <= self.repeat_threshold:
+                break
+            logger.warning(
+                f"{scope['method']} {route_template(scope)} ran the same statement {count} times "
+                f"({profile.count} queries in total), likely an N+1: {statement[:300]}"
+            )
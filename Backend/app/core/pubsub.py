@@ -0,0 +1,153 @@
+"""In-process pub/sub hub for pushing per-user events to open streams.
+
+Publishers call `notification_hub.publish(key, event)`, where `key` is a user
+id or a topic shared by several users; the configured backend carries the
+event to every worker, and each worker's hub delivers it to the local
+subscriptions of that key. The default backend stays inside this
+process, which is enough for a single worker. Multi-worker deployments set
+NOTIFICATION_HUB_BACKEND to a `HubBackend` subclass backed by a shared broker.
+"""
+import asyncio
+from collections import deque
+import importlib
+import logging
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+
+from .config import settings
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Bounded event buffer of one open stream.
+
+    Idle streams only cost this object. A stream that falls more than
+    `maxlen` events behind drops its backlog and is flagged `overflowed`, so
+    it can resynchronise instead of growing without bound.
+    """
+
+    __slots__ = ("user_id", "keys", "maxlen", "overflowed", "_events", "_wakeup")
+
+    def __init__(self, user_id: int, keys: tuple, maxlen: int):
+        self.user_id = user_id
+        self.keys = keys
+        self.maxlen = maxlen
+        self.overflowed = False
+        self._events: deque = deque()
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]):
+        if len(self._events) >= self.maxlen:
+            self._events.clear()
+            self.overflowed = True
+        else:
+            self._events.append(event)
+        self._wakeup.set()
+
+    async def get(self, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """Wait up to `timeout` seconds; return the pending events, or None if none arrived."""
+        if not self._wakeup.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self._wakeup.clear()
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+class HubBackend:
+    """Carries published events to the hubs of all workers.
+
+    This default delivers straight to the local hub. A broker-backed backend
+    sends from `publish` (which must not block) and, from a listener started in
+    `start`, calls `self.hub.deliver` for every event received.
+    """
+
+    def __init__(self, hub: "NotificationHub"):
+        self.hub = hub
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, key: Hashable, event: Dict[str, Any]):
+        self.hub.deliver(key, event)
+
+
+class NotificationHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.backend: HubBackend = HubBackend(self)
+        self._subscriptions: Dict[Hashable, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = Counter()
+        self.overflows = Counter()
+
+    def subscribe(self, user_id: int, topics: Iterable[Hashable] = ()) -> Subscription:
+        """Subscribe to events for `user_id` and for each of `topics`."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, (user_id, *topics), self.queue_size)
+        for key in subscription.keys:
+            self._subscriptions.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for key in subscription.keys:
+            subscriptions = self._subscriptions.get(key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[key]
+
+    def publish(self, key: Hashable, event: Dict[str, Any]):
+        self.published.inc()
+        try:
+            self.backend.publish(key, event)
+        except Exception:
+            # a lost push only delays the client until its next resync
+            logger.exception("Failed to publish event for %r", key)
+
+    def deliver(self, key: Hashable, event: Dict[str, Any]):
+        """Hand `event` to this worker's subscriptions of `key`."""
+        if key not in self._subscriptions:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if not on_loop:
+            # published from another thread (e.g. a sync session)
+            self._loop.call_soon_threadsafe(self.deliver, key, event)
+            return
+        for subscription in self._subscriptions.get(key, ()):
+            was_overflowed = subscription.overflowed
+            subscription.push(event)
+            if subscription.overflowed and not was_overflowed:
+                self.overflows.inc()
+
+    async def start(self):
+        if settings.NOTIFICATION_HUB_BACKEND:
+            module_name, _, class_name = settings.NOTIFICATION_HUB_BACKEND.partition(":")
+            backend_class = getattr(importlib.import_module(module_name), class_name)
+            self.backend = backend_class(self)
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "keys": len(self._subscriptions),
+            "streams": len({s for subs in self._subscriptions.values() for s in subs}),
+            "published": self.published.value,
+            "overflows": self.overflows.value,
+        }
+
+
+notification_hub = NotificationHub(settings.NOTIFICATION_STREAM_QUEUE_SIZE)
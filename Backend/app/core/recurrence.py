@@ -0,0 +1,70 @@
+"""Expansion of RRULE-style daily and weekly recurrences into occurrences.
+
+Follows RFC 5545 semantics for the supported subset: FREQ=DAILY|WEEKLY with
+INTERVAL, BYDAY (weekly only), UNTIL and COUNT, and EXDATE applied after
+COUNT. Every occurrence keeps the time of day and length of the first one.
+"""
+from datetime import date, datetime, timedelta
+from typing import Collection, Iterator, List, Optional, Sequence, Tuple
+
+from app.models import RecurrenceFrequency
+
+# Longest series one request may create
+MAX_OCCURRENCES = 366
+
+
+def _candidates(start: datetime, frequency: RecurrenceFrequency, interval: int, weekdays: Optional[Sequence[int]]) -> Iterator[datetime]:
+    if frequency == RecurrenceFrequency.DAILY:
+        step = timedelta(days=interval)
+        current = start
+        while True:
+            yield current
+            current += step
+
+    days = sorted(set(weekdays)) if weekdays else [start.weekday()]
+    week_start = start - timedelta(days=start.weekday())
+    while True:
+        for day in days:
+            current = week_start + timedelta(days=day)
+            if current >= start:
+                yield current
+        week_start += timedelta(weeks=interval)
+
+
+def expand_occurrences(
+    start: datetime,
+    end: datetime,
+    frequency: RecurrenceFrequency,
+    interval: int = 1,
+    weekdays: Optional[Sequence[int]] = None,
+    until: Optional[datetime] = None,
+    count: Optional[int] = None,
+    exdates: Collection[date] = (),
+    max_occurrences: int = MAX_OCCURRENCES,
+) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of every occurrence, in order.
+
+    Raises ValueError if the series is unbounded, has more than
+    `max_occurrences` occurrences, or its occurrences overlap each other.
+    """
+    if until is None and count is None:
+        raise ValueError("A recurring series needs 'until' or 'count'")
+    duration = end - start
+    exdates = set(exdates)
+
+    occurrences: List[Tuple[datetime, datetime]] = []
+    generated = 0
+    for current in _candidates(start, frequency, interval, weekdays):
+        if until is not None and current > until:
+            break
+        if count is not None and generated >= count:
+            break
+        generated += 1
+        if current.date() in exdates:
+            continue
+        if len(occurrences) == max_occurrences:
+            raise ValueError(f"A recurring series may have at most {max_occurrences} occurrences")
+        if occurrences and current < occurrences[-1][1]:
+            raise ValueError("Occurrences of the series overlap each other")
+        occurrences.append((current, current + duration))
+    return occurrences
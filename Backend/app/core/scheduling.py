@@ -0,0 +1,58 @@
+"""Weighted interval scheduling over reservation requests.
+
+Picks the subset of mutually non-overlapping requests with the largest total
+weight: requests sorted by end time, each one's latest compatible predecessor
+found by binary search, then one dynamic-programming pass. O(n log n), so
+thousands of candidates take milliseconds.
+"""
+from bisect import bisect_right
+from datetime import datetime
+from typing import Hashable, List, NamedTuple, Tuple
+
+
+class Candidate(NamedTuple):
+    id: Hashable
+    start: datetime
+    end: datetime
+    # compared as tuples, so later elements only break ties between earlier ones
+    weight: Tuple[float, ...]
+
+
+def _add(a: Tuple[float, ...], b: Tuple[float, ...]) -> Tuple[float, ...]:
+    return tuple(x + y for x, y in zip(a, b))
+
+
+def max_weight_schedule(candidates: List[Candidate]) -> List[Hashable]:
+    """Ids of the non-overlapping candidates with the largest total weight, in start order.
+
+    Intervals are half-open, so one ending exactly when another starts does not overlap it.
+    """
+    if not candidates:
+        return []
+    ordered = sorted(candidates, key=lambda c: (c.end, c.start))
+    ends = [c.end for c in ordered]
+    zero = tuple(0 for _ in ordered[0].weight)
+
+    # best[i] is the best total over the first i candidates (by end time)
+    best = [zero]
+    taken = [False]
+    for i, candidate in enumerate(ordered):
+        # candidates before `previous` all end by the time this one starts
+        previous = bisect_right(ends, candidate.start, 0, i)
+        with_it = _add(best[previous], candidate.weight)
+        if with_it > best[i]:
+            best.append(with_it)
+            taken.append(True)
+        else:
+            best.append(best[i])
+            taken.append(False)
+
+    chosen = []
+    i = len(ordered)
+    while i > 0:
+        if taken[i]:
+            chosen.append(ordered[i - 1])
+            i = bisect_right(ends, ordered[i - 1].start, 0, i - 1)
+        else:
+            i -= 1
+    return [c.id for c in sorted(chosen, key=lambda c: c.start)]
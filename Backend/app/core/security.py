@@ -1,9 +1,22 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
+import time
+from typing import Optional, Tuple
 from .config import settings
+from .metrics import Counter, Histogram
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds makes hashes below the configured work factor count as deprecated,
+# so verify_and_update() hands back a rehash for them
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -11,8 +24,115 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify `plain`; also return a new hash if `hashed` uses outdated settings."""
+    return pwd_context.verify_and_update(plain, hashed)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+# --- Password hashing pool ---------------------------------------------------
+# bcrypt is deliberately slow and holds the GIL, so it runs in worker processes.
+# At most PASSWORD_HASH_MAX_CONCURRENCY hashes run at once per API worker and at
+# most PASSWORD_HASH_MAX_QUEUE wait; anything beyond that is rejected right away
+# instead of piling up behind a login storm.
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_queued = 0
+_running = 0
+
+password_hash_wait_seconds = Histogram()
+password_hash_seconds = Histogram()
+password_hash_rejections = Counter()
+
+def _new_executor() -> ProcessPoolExecutor:
+    # Forking a process that already runs threads (the event loop's executor,
+    # aiosqlite) can copy held locks into the child; forkserver children start
+    # from a clean, single-threaded server process instead
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, mp_context=context)
+
+def _warm_up() -> None:
+    pwd_context.hash("warm-up")
+
+async def start_password_hasher():
+    """Start the hashing processes before the first login instead of during it."""
+    global _executor
+    if _executor is None and settings.PASSWORD_HASH_WORKERS > 0:
+        _executor = _new_executor()
+        loop = asyncio.get_running_loop()
+        # One task per worker makes the pool start all of them now
+        await asyncio.gather(*(
+            loop.run_in_executor(_executor, _warm_up) for _ in range(settings.PASSWORD_HASH_WORKERS)
+        ))
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if _executor is None and settings.PASSWORD_HASH_WORKERS > 0:
+        # Only outside the app (scripts); the app starts the pool on startup
+        _executor = _new_executor()
+    return _executor
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    return _semaphore
+
+async def _run_hasher(fn, *args):
+    global _queued, _running
+    if _queued >= settings.PASSWORD_HASH_MAX_QUEUE:
+        password_hash_rejections.inc()
+        raise PasswordHasherBusy("Too many login requests, please retry shortly")
+
+    semaphore = _get_semaphore()
+    _queued += 1
+    start = time.perf_counter()
+    try:
+        await semaphore.acquire()
+    finally:
+        _queued -= 1
+    password_hash_wait_seconds.observe(time.perf_counter() - start)
+
+    _running += 1
+    start = time.perf_counter()
+    try:
+        # PASSWORD_HASH_WORKERS=0 falls back to the default thread pool
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        password_hash_seconds.observe(time.perf_counter() - start)
+        _running -= 1
+        semaphore.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(hash_password, password)
+
+async def verify_and_update_password_async(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hasher(verify_and_update_password, plain, hashed)
+
+def password_hasher_status() -> dict:
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_concurrency": settings.PASSWORD_HASH_MAX_CONCURRENCY,
+        "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+        "running": _running,
+        "queued": _queued,
+        "rejections": password_hash_rejections.value,
+        "wait_seconds": password_hash_wait_seconds.snapshot(),
+        "hash_seconds": password_hash_seconds.snapshot(),
+    }
+
+def shutdown_password_hasher():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
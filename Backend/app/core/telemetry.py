@@ -0,0 +1,120 @@
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import Counter, Exposition, Family, Gauge, Histogram
+
+# Requests that match no route share one label, so scanners probing random
+# paths cannot grow the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+SQL_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+http_requests = Family(("method", "route", "status"))
+http_request_seconds = Family(("method", "route"), Histogram)
+http_requests_in_flight = Family(("method", "route"), Gauge)
+
+sql_statements = Family(("operation",))
+sql_statement_seconds = Family(("operation",), Histogram)
+
+reservations_created = Counter()
+reservations_approved = Counter()
+reservations_denied = Counter()
+reservations_cancelled = Counter()
+
+
+def route_template(scope: Scope) -> str:
+    """The path template of the route `scope` is for, e.g. /reservations/{reservation_id}."""
+    # The routes' own regexes and methods; Route.matches() would also build
+    # the path params, which costs more than the rest of the middleware
+    path, method = scope["path"], scope["method"]
+    partial: Optional[str] = None
+    for route in scope["app"].routes:
+        regex = getattr(route, "path_regex", None)
+        if regex is None or not regex.match(path):
+            continue
+        methods = getattr(route, "methods", None)
+        if methods is None or method in methods:
+            return route.path
+        if partial is None:
+            # path matches but the method does not: answered with a 405
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Counts requests and times them per method and route template.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streamed responses (the
+    notification stream, exports) pass through untouched; they are timed
+    until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500  # unless a response starts, the error handler answers 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = http_requests_in_flight.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            http_request_seconds.labels(method, route).observe(time.perf_counter() - started)
+            http_requests.labels(method, route, str(status_code)).inc()
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in SQL_OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    operation = _operation(statement)
+    sql_statements.labels(operation).inc()
+    sql_statement_seconds.labels(operation).observe(time.perf_counter() - context._metrics_started)
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement `engine` executes (pass AsyncEngine.sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def add_app_metrics(exposition: Exposition):
+    """Add the HTTP, SQL and reservation metrics of this worker to `exposition`."""
+    exposition.add_family("http_requests_total", "counter", "HTTP requests by method, route template and status.", http_requests)
+    exposition.add_family("http_request_duration_seconds", "histogram", "HTTP request latency by method and route template.", http_request_seconds)
+    exposition.add_family("http_requests_in_flight", "gauge", "HTTP requests being served.", http_requests_in_flight)
+    exposition.add_family("db_statements_total", "counter", "SQL statements executed, by operation.", sql_statements)
+    exposition.add_family("db_statement_duration_seconds", "histogram", "SQL statement execution time, by operation.", sql_statement_seconds)
+    for name, counter, help in (
+        ("reservations_created_total", reservations_created, "Reservations requested, including series occurrences."),
+        ("reservations_approved_total", reservations_approved, "Reservations approved."),
+        ("reservations_denied_total", reservations_denied, "Reservations denied."),
+        ("reservations_cancelled_total", reservations_cancelled, "Reservations cancelled by their owner."),
+    ):
+        exposition.add(name, "counter", help, [({}, counter.value)])
@@ -0,0 +1,333 @@
+"""Approved-reservation calendar, materialized per (hall, month).
+
+A month is loaded once and kept as pre-serialized JSON event payloads, so
+calendar navigation is answered without a query or per-event serialization.
+An entry is dropped when a reservation starting in that month is approved or
+cancelled, and every month of a hall when the hall itself changes; other
+workers' changes show up within CALENDAR_CACHE_TTL_SECONDS.
+
+The same invalidation hooks bump the version stamps behind the ETags of the
+iCalendar feeds, which stream straight from the database.
+"""
+from datetime import datetime, time, timedelta
+import hashlib
+from itertools import count
+import json
+import logging
+from typing import AsyncIterator, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, VersionStamps
+from app.core.config import settings
+from app.core.ical import CALENDAR_FOOTER, calendar_header, vevent
+from app.core.intervals import normalize_dt
+from app.crud.crud_reference import columns_changed
+from app.models import Hall, Reservation, ReservationStatus
+
+logger = logging.getLogger(__name__)
+
+# hall_id None is the all-halls calendar
+ALL_HALLS = None
+
+# Longest range one request may materialize
+MAX_CALENDAR_MONTHS = 36
+
+# Rows fetched per round trip while streaming a feed
+FEED_BATCH_SIZE = 500
+
+
+class CalendarMonth(NamedTuple):
+    # (start, end, admin payload, public payload), ordered by start
+    events: List[Tuple[datetime, datetime, str, str]]
+    etag: str
+    built_at: datetime
+
+
+class CalendarView(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+calendar_cache = TTLCache(maxsize=settings.CALENDAR_CACHE_MAX_MONTHS, ttl=settings.CALENDAR_CACHE_TTL_SECONDS)
+
+# Bumping a hall's generation orphans all of its cached months at once
+_generations = count(1)
+_hall_generation: Dict[Optional[int], int] = {}
+# Incremented on every invalidation; a load that overlapped one is not cached
+_invalidations = 0
+
+feed_versions = VersionStamps(ttl=settings.ICS_FEED_ETAG_TTL_SECONDS)
+
+
+def hall_feed_key(hall_id: int) -> tuple:
+    return "hall", hall_id
+
+
+def user_feed_key(user_id: int) -> tuple:
+    return "user", user_id
+
+
+def _month_of(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _cache_key(hall_id: Optional[int], month: datetime) -> tuple:
+    return hall_id, _hall_generation.get(hall_id, 0), month
+
+
+def invalidate_user_feed(user_id: int) -> None:
+    feed_versions.bump(user_feed_key(user_id))
+
+
+def invalidate_reservation(reservation: Reservation, approved: bool = True) -> None:
+    """Invalidate what a committed change to `reservation` affects.
+
+    Its owner's feed always changes. Its calendar month and hall feed change
+    only if `approved`, i.e. the reservation became or stopped being APPROVED.
+    """
+    global _invalidations
+    invalidate_user_feed(reservation.user_id)
+    if not approved:
+        return
+    _invalidations += 1
+    feed_versions.bump(hall_feed_key(reservation.hall_id))
+    month = _month_of(normalize_dt(reservation.start_datetime))
+    for key in (reservation.hall_id, ALL_HALLS):
+        calendar_cache.pop(_cache_key(key, month))
+
+
+def invalidate_hall(hall_id: int) -> None:
+    global _invalidations
+    _invalidations += 1
+    feed_versions.bump(hall_feed_key(hall_id))
+    for key in (hall_id, ALL_HALLS):
+        _hall_generation[key] = next(_generations)
+
+
+def _invalidate_hall_user_feeds(connection, hall_id: int) -> None:
+    """Bump the feeds of the users with reservations in the hall shown in them."""
+    user_ids = connection.execute(
+        select(Reservation.user_id)
+        .distinct()
+        .where(
+            Reservation.hall_id == hall_id,
+            Reservation.status.in_([ReservationStatus.PENDING, ReservationStatus.APPROVED]),
+            Reservation.end_datetime >= feed_window_start()
+        )
+    ).scalars()
+    for user_id in user_ids:
+        if user_id is not None:
+            invalidate_user_feed(user_id)
+
+
+@event.listens_for(Hall, "after_insert")
+@event.listens_for(Hall, "after_delete")
+def _invalidate_changed_hall(mapper, connection, target):
+    # event titles carry the hall name
+    invalidate_hall(target.id)
+
+
+@event.listens_for(Hall, "before_delete")
+def _invalidate_deleted_hall_user_feeds(mapper, connection, target):
+    # before the delete cascades to the reservations that name the users
+    _invalidate_hall_user_feeds(connection, target.id)
+
+
+@event.listens_for(Hall, "after_update")
+def _invalidate_updated_hall(mapper, connection, target):
+    if columns_changed(target):
+        invalidate_hall(target.id)
+        _invalidate_hall_user_feeds(connection, target.id)
+
+
+def _serialize(row) -> Tuple[datetime, datetime, str, str]:
+    hall_name = row.hall_name or "Hall Unavailable"
+    if not row.hall_name:
+        logger.warning(f"Calendar event for reservation {row.id} references missing hall_id {row.hall_id}")
+    start, end = row.start_datetime.isoformat(), row.end_datetime.isoformat()
+    admin = json.dumps({
+        "id": row.id,
+        "title": f"{row.description or 'Reservation'} - {hall_name}",
+        "start": start,
+        "end": end,
+        "user_id": row.user_id,
+        "hall_id": row.hall_id,
+        "hall_status": "active" if row.hall_name else "deleted",
+    })
+    # Read-only view for non-admins: when a hall is taken, not by whom or why
+    public = json.dumps({
+        "id": row.id,
+        "title": f"Reserved - {hall_name}",
+        "start": start,
+        "end": end,
+        "hall_id": row.hall_id,
+    })
+    return row.start_datetime, row.end_datetime, admin, public
+
+
+async def _load_months(db: AsyncSession, hall_id: Optional[int], months: List[datetime]) -> Dict[datetime, CalendarMonth]:
+    """Materialize `months` (sorted) with one query spanning all of them."""
+    invalidations = _invalidations
+    query = (
+        select(
+            Reservation.id,
+            Reservation.description,
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+            Reservation.user_id,
+            Reservation.hall_id,
+            Hall.name.label("hall_name"),
+        )
+        .outerjoin(Hall, Reservation.hall_id == Hall.id)
+        .where(
+            Reservation.status == ReservationStatus.APPROVED,
+            Reservation.start_datetime >= months[0],
+            Reservation.start_datetime < _next_month(months[-1])
+        )
+        .order_by(Reservation.start_datetime, Reservation.id)
+    )
+    if hall_id is not ALL_HALLS:
+        query = query.where(Reservation.hall_id == hall_id)
+
+    by_month: Dict[datetime, list] = {month: [] for month in months}
+    for row in (await db.execute(query)).all():
+        events = by_month.get(_month_of(row.start_datetime))
+        if events is not None:
+            events.append(_serialize(row))
+
+    built_at = datetime.utcnow()
+    loaded = {}
+    for month, events in by_month.items():
+        digest = hashlib.sha1("\n".join(admin for _, _, admin, _ in events).encode()).hexdigest()
+        loaded[month] = CalendarMonth(events, digest, built_at)
+        if invalidations == _invalidations:
+            calendar_cache.set(_cache_key(hall_id, month), loaded[month])
+    return loaded
+
+
+async def get_calendar(db: AsyncSession, start_date: datetime, end_date: datetime, hall_id: Optional[int] = None, admin: bool = True) -> CalendarView:
+    """Approved reservations inside [start_date, end_date], as a ready JSON array.
+
+    Raises ValueError if the range spans more than MAX_CALENDAR_MONTHS months.
+    """
+    start_date, end_date = normalize_dt(start_date), normalize_dt(end_date)
+    months = []
+    month = _month_of(start_date)
+    while month <= end_date:
+        if len(months) == MAX_CALENDAR_MONTHS:
+            raise ValueError(f"Calendar range may span at most {MAX_CALENDAR_MONTHS} months")
+        months.append(month)
+        month = _next_month(month)
+
+    cached = {month: calendar_cache.get(_cache_key(hall_id, month)) for month in months}
+    missing = [month for month, entry in cached.items() if entry is None]
+    if missing:
+        cached.update(await _load_months(db, hall_id, missing))
+
+    payloads = []
+    digest = hashlib.sha1(f"{admin}|{hall_id}|{start_date}|{end_date}".encode())
+    last_modified = datetime.min
+    for month in months:
+        entry = cached[month]
+        digest.update(entry.etag.encode())
+        last_modified = max(last_modified, entry.built_at)
+        for start, end, admin_payload, public_payload in entry.events:
+            if start >= start_date and end <= end_date:
+                payloads.append(admin_payload if admin else public_payload)
+
+    body = ("[" + ",".join(payloads) + "]").encode()
+    if not months:
+        last_modified = datetime.utcnow()
+    return CalendarView(body, f'"{digest.hexdigest()}"', last_modified)
+
+
+# --- iCalendar feeds ---
+
+def feed_window_start() -> datetime:
+    """Feeds leave out events that ended more than ICS_FEED_PAST_DAYS ago."""
+    today = datetime.utcnow().date()
+    return datetime.combine(today - timedelta(days=settings.ICS_FEED_PAST_DAYS), time.min)
+
+
+def feed_etag(key: Hashable) -> str:
+    # the window moves daily, so its start is part of the tag
+    return feed_versions.etag(key, feed_window_start().date().isoformat())
+
+
+def _feed_event(row, summary: str, location: Optional[str] = None, description: Optional[str] = None) -> str:
+    return vevent(
+        uid=f"reservation-{row.id}@hall-reservation",
+        start=row.start_datetime,
+        end=row.end_datetime,
+        summary=summary,
+        stamp=row.created_at or row.start_datetime,
+        location=location,
+        description=description,
+        status="CONFIRMED" if row.status == ReservationStatus.APPROVED else "TENTATIVE",
+    )
+
+
+async def stream_hall_feed(db: AsyncSession, hall: Hall) -> AsyncIterator[str]:
+    """The hall's APPROVED reservations as an iCalendar document, in chunks."""
+    yield calendar_header(f"{hall.name} reservations")
+    result = await db.stream(
+        select(
+            Reservation.id,
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+            Reservation.created_at,
+            Reservation.status,
+        )
+        .where(
+            Reservation.hall_id == hall.id,
+            Reservation.status == ReservationStatus.APPROVED,
+            Reservation.end_datetime >= feed_window_start()
+        )
+        .order_by(Reservation.start_datetime)
+        .execution_options(yield_per=FEED_BATCH_SIZE)
+    )
+    async for rows in result.partitions():
+        yield "".join(_feed_event(row, "Reserved", location=f"{hall.name}") for row in rows)
+    yield CALENDAR_FOOTER
+
+
+async def stream_user_feed(db: AsyncSession, user_id: int) -> AsyncIterator[str]:
+    """The user's PENDING (tentative) and APPROVED reservations as an iCalendar document."""
+    yield calendar_header("My hall reservations")
+    result = await db.stream(
+        select(
+            Reservation.id,
+            Reservation.description,
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+            Reservation.created_at,
+            Reservation.status,
+            Hall.name.label("hall_name"),
+        )
+        .outerjoin(Hall, Reservation.hall_id == Hall.id)
+        .where(
+            Reservation.user_id == user_id,
+            Reservation.status.in_([ReservationStatus.PENDING, ReservationStatus.APPROVED]),
+            Reservation.end_datetime >= feed_window_start()
+        )
+        .order_by(Reservation.start_datetime)
+        .execution_options(yield_per=FEED_BATCH_SIZE)
+    )
+    async for rows in result.partitions():
+        yield "".join(
+            _feed_event(
+                row,
+                f"{row.description or 'Reservation'} - {row.hall_name or 'Hall Unavailable'}",
+                location=f"{row.hall_name}" if row.hall_name else None,
+                description=f"Status: {row.status.value}",
+            )
+            for row in rows
+        )
+    yield CALENDAR_FOOTER
@@ -1,7 +1,9 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
+from app.core.pagination import paginate
 from app.models import Feedback, Reservation, Hall
 from app.schemas import FeedbackCreate
 
@@ -9,27 +11,33 @@ from app.schemas import FeedbackCreate
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_feedback(db: Session, feedback_in: FeedbackCreate, user_id: int) -> Optional[Feedback]:
+async def create_feedback(db: AsyncSession, feedback_in: FeedbackCreate, user_id: int) -> Optional[Feedback]:
     """Create feedback for a reservation after verifying user ownership and hall existence."""
-    reservation = db.query(Reservation).filter(
-        Reservation.id == feedback_in.reservation_id,
-        Reservation.user_id == user_id
-    ).first()
+    result = await db.execute(
+        select(Reservation).where(
+            Reservation.id == feedback_in.reservation_id,
+            Reservation.user_id == user_id
+        )
+    )
+    reservation = result.scalars().first()
     
     if not reservation:
         logger.error(f"Reservation {feedback_in.reservation_id} not found or not owned by user {user_id}")
         return None
     
     # Validate hall existence
-    hall = db.query(Hall).filter(Hall.id == reservation.hall_id).first()
+    hall = await db.get(Hall, reservation.hall_id)
     if not hall:
         logger.error(f"Reservation {reservation.id} references non-existent hall {reservation.hall_id}")
         return None
     
     # Check if feedback already exists
-    existing_feedback = db.query(Feedback).filter(
-        Feedback.reservation_id == feedback_in.reservation_id
-    ).first()
+    result = await db.execute(
+        select(Feedback).where(
+            Feedback.reservation_id == feedback_in.reservation_id
+        )
+    )
+    existing_feedback = result.scalars().first()
     
     if existing_feedback:
         logger.warning(f"Feedback already exists for reservation {feedback_in.reservation_id}")
@@ -42,28 +50,30 @@ def create_feedback(db: Session, feedback_in: FeedbackCreate, user_id: int) -> O
     )
     
     db.add(feedback)
-    db.commit()
-    db.refresh(feedback)
+    await db.commit()
+    await db.refresh(feedback)
     return feedback
 
-def get_feedback(db: Session, feedback_id: int) -> Optional[Feedback]:
-    return db.query(Feedback).filter(Feedback.id == feedback_id).first()
+async def get_feedback(db: AsyncSession, feedback_id: int) -> Optional[Feedback]:
+    return await db.get(Feedback, feedback_id)
 
-def get_feedbacks_by_reservation(db: Session, reservation_id: int) -> List[Feedback]:
-    return db.query(Feedback).filter(Feedback.reservation_id == reservation_id).all()
+async def get_feedbacks_by_reservation(db: AsyncSession, reservation_id: int) -> List[Feedback]:
+    result = await db.execute(select(Feedback).where(Feedback.reservation_id == reservation_id))
+    return result.scalars().all()
 
-def get_all_feedbacks(db: Session, skip: int = 0, limit: int = 100) -> List[Feedback]:
-    """Retrieve all feedback with associated reservation and hall data."""
-    from sqlalchemy import outerjoin
-    
-    feedbacks = (
-        db.query(Feedback)
+FEEDBACK_ORDER = (Feedback.created_at, Feedback.id)
+
+async def get_all_feedbacks(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Feedback]:
+    """Retrieve all feedback with associated reservation and hall data, newest first."""
+    query = paginate(
+        select(Feedback)
         .join(Reservation, Feedback.reservation_id == Reservation.id)
-        .outerjoin(Hall, Reservation.hall_id == Hall.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .outerjoin(Hall, Reservation.hall_id == Hall.id),
+        FEEDBACK_ORDER,
+        cursor
     )
+    result = await db.execute(query.offset(skip).limit(limit))
+    feedbacks = result.scalars().all()
     
     # Post-process feedbacks to handle missing halls
     for feedback in feedbacks:
@@ -78,8 +88,11 @@ def get_all_feedbacks(db: Session, skip: int = 0, limit: int = 100) -> List[Feed
     
     return feedbacks
 
-def get_user_feedbacks(db: Session, user_id: int) -> List[Feedback]:
+async def get_user_feedbacks(db: AsyncSession, user_id: int) -> List[Feedback]:
     """Get all feedback for a user's reservations."""
-    return db.query(Feedback).join(Reservation).filter(
-        Reservation.user_id == user_id
-    ).all()
\ No newline at end of file
+    result = await db.execute(
+        select(Feedback).join(Reservation).where(
+            Reservation.user_id == user_id
+        )
+    )
+    return result.scalars().all()
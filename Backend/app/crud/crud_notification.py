@@ -1,11 +1,121 @@
+from collections import Counter
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Boolean, DateTime, case, event, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional, Union, Dict
+from typing import Hashable, List, Optional, Tuple, Union, Dict
 
+from app.core.pagination import paginate
+from app.core.pubsub import notification_hub
 from app.models import Notification, User
-from app.schemas import NotificationCreate
+from app.schemas import NotificationCreate, NotificationOut
 
-def create_notification(db: Session, notification_in: Union[NotificationCreate, Dict]) -> Notification:
-    """Create a notification for a specific user or all users."""
+# Stream events queued on the session and published only once it commits,
+# so subscribers never see a notification that is rolled back
+_PENDING_EVENTS = "pending_notification_events"
+
+# Stream topic every admin subscribes to, for notifications fanned out to all admins
+ADMINS_TOPIC = "admins"
+
+def _queue_event(db: AsyncSession, key: Hashable, payload: Union[Notification, Dict]) -> None:
+    db.info.setdefault(_PENDING_EVENTS, []).append((key, payload))
+
+@event.listens_for(Session, "after_flush_postexec")
+def _serialize_pending_events(session, flush_context):
+    # Serialized right after the flush that assigned ids; once committed the
+    # rows may be expired and can no longer be loaded
+    pending = session.info.get(_PENDING_EVENTS)
+    for i, (key, payload) in enumerate(pending or ()):
+        if isinstance(payload, Notification) and payload.id is not None:
+            pending[i] = (key, {
+                "type": "notification",
+                "notification": jsonable_encoder(NotificationOut.from_orm(payload)),
+            })
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(session):
+    for key, payload in session.info.pop(_PENDING_EVENTS, ()):
+        if isinstance(payload, dict):
+            notification_hub.publish(key, payload)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_events(session, previous_transaction):
+    session.info.pop(_PENDING_EVENTS, None)
+
+async def _adjust_unread(db: AsyncSession, user_id: int, delta: int) -> None:
+    """Shift a user's unread counter by `delta` (never below zero), in the caller's transaction."""
+    counter = User.unread_notifications
+    value = counter + delta if delta > 0 else case((counter > -delta, counter + delta), else_=0)
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(unread_notifications=value)
+        .execution_options(synchronize_session=False)
+    )
+
+async def add_notification(db: AsyncSession, user_id: int, message: str) -> Notification:
+    """Stage a notification and its unread-counter increment without committing."""
+    notification = Notification(user_id=user_id, message=message)
+    db.add(notification)
+    await _adjust_unread(db, user_id, 1)
+    _queue_event(db, user_id, notification)
+    return notification
+
+async def add_notifications(db: AsyncSession, messages: List[Tuple[int, str]]) -> int:
+    """Stage many (user_id, message) notifications without committing; returns how many.
+
+    One multi-row INSERT plus one counter UPDATE for all recipients. The rows'
+    ids are not fetched, so open streams are told to resync instead of being
+    sent the notifications themselves.
+    """
+    if not messages:
+        return 0
+    now = datetime.utcnow()
+    await db.execute(insert(Notification), [
+        {"user_id": user_id, "message": message, "is_read": False, "created_at": now}
+        for user_id, message in messages
+    ])
+    received = Counter(user_id for user_id, _ in messages)
+    await db.execute(
+        update(User)
+        .where(User.id.in_(received))
+        .values(unread_notifications=User.unread_notifications + case(received, value=User.id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    for user_id in received:
+        _queue_event(db, user_id, {"type": "broadcast"})
+    return len(messages)
+
+async def add_admin_notification(db: AsyncSession, message: str) -> int:
+    """Stage one notification per admin without committing; returns how many.
+
+    A single INSERT ... SELECT over the admin users plus one counter UPDATE,
+    however many admins there are.
+    """
+    admins = select(
+        User.id,
+        literal(message),
+        literal(False, Boolean),
+        literal(datetime.utcnow(), DateTime),
+    ).where(User.is_admin == True)
+    result = await db.execute(
+        insert(Notification).from_select(["user_id", "message", "is_read", "created_at"], admins)
+    )
+    await db.execute(
+        update(User)
+        .where(User.is_admin == True)
+        .values(unread_notifications=User.unread_notifications + 1)
+        .execution_options(synchronize_session=False)
+    )
+    _queue_event(db, ADMINS_TOPIC, {"type": "broadcast"})
+    return result.rowcount
+
+async def create_notification(db: AsyncSession, notification_in: Union[NotificationCreate, Dict]) -> Optional[Notification]:
+    """Create a notification for a specific user, or for all admins if `user_id` is None.
+
+    Returns the notification, or None when it was fanned out to the admins.
+    """
     # Handle case where a dictionary is passed instead of NotificationCreate
     if isinstance(notification_in, dict):
         user_id = notification_in.get("user_id")
@@ -13,60 +123,77 @@ def create_notification(db: Session, notification_in: Union[NotificationCreate,
     else:
         user_id = notification_in.user_id
         message = notification_in.message
-        
-    notification = Notification(
-        user_id=user_id,
-        message=message
-    )
-    
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
+
+    if user_id is None:
+        await create_admin_notification(db, message)
+        return None
+
+    notification = await add_notification(db, user_id, message)
+    await db.commit()
+    await db.refresh(notification)
     return notification
 
-def create_admin_notification(db: Session, message: str) -> List[Notification]:
-    """Create notifications for all admin users."""
-    admin_users = db.query(User).filter(User.is_admin == True).all()
-    notifications = []
-    
-    for admin in admin_users:
-        notification = Notification(
-            user_id=admin.id,
-            message=message
-        )
-        db.add(notification)
-        notifications.append(notification)
-    
-    db.commit()
-    return notifications
+async def create_admin_notification(db: AsyncSession, message: str) -> int:
+    """Create notifications for all admin users; returns how many were created."""
+    count = await add_admin_notification(db, message)
+    await db.commit()
+    return count
+
+NOTIFICATION_ORDER = (Notification.created_at, Notification.id)
 
-def get_user_notifications(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Notification]:
-    """Get all notifications for a specific user."""
-    return db.query(Notification).filter(
-        Notification.user_id == user_id
-    ).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+async def get_user_notifications(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Notification]:
+    """Get all notifications for a specific user, newest first."""
+    query = paginate(
+        select(Notification).where(Notification.user_id == user_id),
+        NOTIFICATION_ORDER,
+        cursor
+    )
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
-def mark_notification_as_read(db: Session, notification_id: int, user_id: int) -> Optional[Notification]:
+async def mark_notification_as_read(db: AsyncSession, notification_id: int, user_id: int) -> Optional[Notification]:
     """Mark a notification as read if it belongs to the user."""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == user_id
-    ).first()
+    result = await db.execute(
+        select(Notification).where(
+            Notification.id == notification_id,
+            Notification.user_id == user_id
+        )
+    )
+    notification = result.scalars().first()
     
     if not notification:
         return None
     
-    notification.is_read = True
-    db.commit()
-    db.refresh(notification)
+    # Only an actual unread -> read transition moves the counter
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.id == notification_id, Notification.is_read == False)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        await _adjust_unread(db, user_id, -result.rowcount)
+        _queue_event(db, user_id, {"type": "read"})
+    await db.commit()
+    await db.refresh(notification)
     return notification
 
-def mark_all_notifications_as_read(db: Session, user_id: int) -> int:
+async def mark_all_notifications_as_read(db: AsyncSession, user_id: int) -> int:
     """Mark all notifications for a user as read."""
-    result = db.query(Notification).filter(
-        Notification.user_id == user_id,
-        Notification.is_read == False
-    ).update({Notification.is_read: True})
+    result = await db.execute(
+        update(Notification).where(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).values(is_read=True)
+    )
+    if result.rowcount:
+        await _adjust_unread(db, user_id, -result.rowcount)
+        _queue_event(db, user_id, {"type": "read"})
     
-    db.commit()
-    return result
\ No newline at end of file
+    await db.commit()
+    return result.rowcount
+
+async def get_unread_count(db: AsyncSession, user_id: int) -> int:
+    """Read the user's denormalized unread counter (primary-key lookup)."""
+    result = await db.execute(select(User.unread_notifications).where(User.id == user_id))
+    return result.scalar() or 0
@@ -0,0 +1,159 @@
+"""In-process snapshot of the reference data: halls and resources.
+
+Halls and resources change only through admin writes, yet are read by nearly
+every page load and reservation check. The snapshot is loaded with two queries
+and dropped after any committed change to a Hall or Resource; other workers'
+changes show up within REFERENCE_DATA_TTL_SECONDS. Its ETags are content
+hashes, so they agree across workers.
+"""
+import hashlib
+import json
+from threading import Lock
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.models import Hall, Resource
+
+
+class HallInfo(NamedTuple):
+    id: int
+    name: str
+    capacity: Optional[int]
+
+
+class ResourceInfo(NamedTuple):
+    id: int
+    name: str
+
+
+class ReferenceSnapshot(NamedTuple):
+    halls: Dict[int, HallInfo]
+    resources: Dict[int, ResourceInfo]
+    # pre-serialized GET /halls and GET /resources bodies and their ETags
+    halls_body: bytes
+    halls_etag: str
+    resources_body: bytes
+    resources_etag: str
+    loaded_at: float
+
+
+_snapshot: Optional[ReferenceSnapshot] = None
+_lock = Lock()
+# Incremented on every invalidation; a load that overlapped one is not kept
+_invalidations = 0
+
+# Session.info flag set by the mapper events and acted on after commit
+_CHANGED = "reference_data_changed"
+
+# A lookup miss reloads the snapshot unless it is younger than this (seconds)
+MISS_RELOAD_AFTER = 1.0
+
+
+def invalidate() -> None:
+    global _snapshot, _invalidations
+    with _lock:
+        _snapshot = None
+        _invalidations += 1
+
+
+def columns_changed(target) -> bool:
+    """Whether a flushed instance had a column change, not just a collection one.
+
+    after_update fires for every dirty instance, including a Resource whose
+    only change is a reservation added to its backref collection.
+    """
+    state = inspect(target)
+    return any(state.attrs[attr.key].history.has_changes() for attr in state.mapper.column_attrs)
+
+
+@event.listens_for(Hall, "after_insert")
+@event.listens_for(Hall, "after_delete")
+@event.listens_for(Resource, "after_insert")
+@event.listens_for(Resource, "after_delete")
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[_CHANGED] = True
+    invalidate()
+
+
+@event.listens_for(Hall, "after_update")
+@event.listens_for(Resource, "after_update")
+def _mark_updated(mapper, connection, target):
+    if columns_changed(target):
+        _mark_changed(mapper, connection, target)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    # Invalidate again once the change is visible to other connections, in
+    # case a reload ran between the flush and the commit
+    if session.info.pop(_CHANGED, False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_changed(session, previous_transaction):
+    session.info.pop(_CHANGED, None)
+
+
+def _body_and_etag(items: List[dict]):
+    body = json.dumps(items).encode()
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+async def _load(db: AsyncSession) -> ReferenceSnapshot:
+    global _snapshot
+    invalidations = _invalidations
+    halls = {
+        row.id: HallInfo(row.id, row.name, row.capacity)
+        for row in (await db.execute(select(Hall.id, Hall.name, Hall.capacity).order_by(Hall.id))).all()
+    }
+    resources = {
+        row.id: ResourceInfo(row.id, row.name)
+        for row in (await db.execute(select(Resource.id, Resource.name).order_by(Resource.id))).all()
+    }
+    halls_body, halls_etag = _body_and_etag([hall._asdict() for hall in halls.values()])
+    resources_body, resources_etag = _body_and_etag([resource._asdict() for resource in resources.values()])
+    snapshot = ReferenceSnapshot(
+        halls, resources, halls_body, halls_etag, resources_body, resources_etag, time.monotonic()
+    )
+    with _lock:
+        if invalidations == _invalidations:
+            _snapshot = snapshot
+    return snapshot
+
+
+async def get_snapshot(db: AsyncSession) -> ReferenceSnapshot:
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded_at > settings.REFERENCE_DATA_TTL_SECONDS:
+        snapshot = await _load(db)
+    return snapshot
+
+
+async def get_hall(db: AsyncSession, hall_id: int) -> Optional[HallInfo]:
+    """Look a hall up in the snapshot, reloading it once on a miss.
+
+    The reload keeps a hall just created on another worker from being
+    reported as missing.
+    """
+    snapshot = await get_snapshot(db)
+    hall = snapshot.halls.get(hall_id)
+    if hall is None and time.monotonic() - snapshot.loaded_at > MISS_RELOAD_AFTER:
+        hall = (await _load(db)).halls.get(hall_id)
+    return hall
+
+
+async def missing_hall_ids(db: AsyncSession, hall_ids) -> List[int]:
+    """The ids in `hall_ids` that are not existing halls, sorted."""
+    snapshot = await get_snapshot(db)
+    missing = [hall_id for hall_id in hall_ids if hall_id not in snapshot.halls]
+    if missing and time.monotonic() - snapshot.loaded_at > MISS_RELOAD_AFTER:
+        snapshot = await _load(db)
+        missing = [hall_id for hall_id in missing if hall_id not in snapshot.halls]
+    return sorted(missing)
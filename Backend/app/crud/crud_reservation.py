@@ -1,34 +1,126 @@
-from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List, Optional
+import asyncio
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 
-from app.models import Reservation, ReservationStatus, reservation_resources as ReservationResource, Resource, Notification, User
-from app.schemas import ReservationCreate, ReservationUpdate
+from app.core.config import settings
+from app.core.pagination import paginate
+from app.core.locks import StripedLock
+from app.core.telemetry import reservations_approved, reservations_cancelled, reservations_created, reservations_denied
+from app.core.intervals import HallIntervalIndex, approved_index, normalize_dt, sweep_conflicts, free_gaps
+from app.models import Hall, Reservation, ReservationStatus, Resource
+from app.schemas import ReservationCreate, ReservationUpdate, AvailabilitySlot, ReservationDecision
+from app.crud import crud_reference
+from app.crud.crud_calendar import invalidate_reservation as invalidate_calendar
+from app.crud.crud_notification import add_admin_notification, add_notification, add_notifications
 
-def is_overlapping(db: Session, hall_id: int, start_dt: datetime, end_dt: datetime, exclude_id: Optional[int] = None) -> bool:
-    """Check if there's an existing approved reservation that overlaps with the given time period."""
-    query = db.query(Reservation).filter(
+# Serializes approvals per hall within this worker
+hall_locks = StripedLock(settings.HALL_LOCK_STRIPES)
+
+# How far back the interval index reaches. Stored times are naive and may be
+# local or UTC, so a day of margin keeps ongoing reservations in it either way;
+# checks for slots before the horizon go to the database.
+INDEX_PAST_MARGIN = timedelta(days=1)
+
+# One reload at a time; meanwhile other requests keep using the stale index
+_index_reload_lock = asyncio.Lock()
+
+async def load_approved_index(db: AsyncSession) -> None:
+    """(Re)build the in-process interval index from the APPROVED reservations that have not ended."""
+    horizon = datetime.now() - INDEX_PAST_MARGIN
+    generation = approved_index.begin_load()
+    try:
+        result = await db.execute(
+            select(
+                Reservation.id, Reservation.hall_id, Reservation.start_datetime, Reservation.end_datetime
+            ).where(
+                Reservation.status == ReservationStatus.APPROVED,
+                Reservation.end_datetime > horizon
+            )
+        )
+        rows = result.all()
+    except BaseException:
+        approved_index.cancel_load(generation)
+        raise
+    approved_index.load(rows, horizon, generation)
+
+async def refresh_approved_index(db: AsyncSession) -> None:
+    """Reload the interval index once it is older than INTERVAL_INDEX_TTL_SECONDS."""
+    if not approved_index.is_stale(settings.INTERVAL_INDEX_TTL_SECONDS):
+        return
+    if approved_index.loaded and _index_reload_lock.locked():
+        return
+    async with _index_reload_lock:
+        if approved_index.is_stale(settings.INTERVAL_INDEX_TTL_SECONDS):
+            await load_approved_index(db)
+
+async def is_overlapping(db: AsyncSession, hall_id: int, start_dt: datetime, end_dt: datetime, exclude_id: Optional[int] = None, verify: bool = False) -> bool:
+    """Check if there's an existing approved reservation that overlaps with the given time period.
+
+    Answered from the in-process interval index when it covers the slot; pass
+    `verify=True` to confirm against the database, as required before a write
+    that makes a slot APPROVED. The confirming query is a locking read, so
+    under MySQL's REPEATABLE READ it sees approvals committed after the
+    transaction's snapshot was taken.
+    """
+    start_dt, end_dt = normalize_dt(start_dt), normalize_dt(end_dt)
+    if not verify:
+        await refresh_approved_index(db)
+        if approved_index.covers(start_dt):
+            return approved_index.is_overlapping(hall_id, start_dt, end_dt, exclude_id=exclude_id)
+
+    query = select(Reservation.id).where(
         Reservation.hall_id == hall_id,
         Reservation.status == ReservationStatus.APPROVED,
         Reservation.start_datetime < end_dt,
         Reservation.end_datetime > start_dt
     )
     if exclude_id:
-        query = query.filter(Reservation.id != exclude_id)
-    return query.first() is not None
+        query = query.where(Reservation.id != exclude_id)
+    if verify:
+        query = query.with_for_update(read=True)
+    result = await db.execute(query.limit(1))
+    return result.first() is not None
 
-def get_reservations(db: Session, skip: int = 0, limit: int = 100) -> List[Reservation]:
-    return db.query(Reservation).offset(skip).limit(limit).all()
+# Newest first; `id` breaks ties so keyset cursors are unambiguous
+RESERVATION_ORDER = (Reservation.created_at, Reservation.id)
 
-def get_user_reservations(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Reservation]:
-    return db.query(Reservation).filter(Reservation.user_id == user_id).offset(skip).limit(limit).all()
+async def get_reservations(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Reservation]:
+    query = paginate(select(Reservation), RESERVATION_ORDER, cursor)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
-def get_reservation(db: Session, reservation_id: int) -> Optional[Reservation]:
-    return db.query(Reservation).filter(Reservation.id == reservation_id).first()
+async def get_user_reservations(db: AsyncSession, user_id: int, status: Optional[str] = None, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Reservation]:
+    query = select(Reservation).where(Reservation.user_id == user_id)
+    if status:
+        query = query.where(Reservation.status == ReservationStatus(status))
+    query = paginate(query, RESERVATION_ORDER, cursor)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
-def create_reservation(db: Session, user_id: int, res_in: ReservationCreate) -> Reservation:
-    """Create a new reservation after checking for time conflicts."""
-    if is_overlapping(db, res_in.hall_id, res_in.start_datetime, res_in.end_datetime):
+async def get_reservation(db: AsyncSession, reservation_id: int) -> Optional[Reservation]:
+    return await db.get(Reservation, reservation_id)
+
+async def _load_resources(db: AsyncSession, resource_ids: List[int]) -> List[Resource]:
+    """The existing resources among `resource_ids`, with one IN query; unknown ids are skipped."""
+    if not resource_ids:
+        return []
+    result = await db.execute(select(Resource).where(Resource.id.in_(set(resource_ids))))
+    return result.scalars().all()
+
+async def create_reservation(db: AsyncSession, user_id: int, res_in: ReservationCreate) -> Reservation:
+    """Create a new reservation after checking for time conflicts.
+
+    One transaction: an IN query for the resources, the reservation INSERT,
+    one batched INSERT of its resource rows and the admin notification. The
+    hall comes from the reference snapshot and the returned object is
+    complete, so nothing is read back after the commit.
+    """
+    hall = await crud_reference.get_hall(db, res_in.hall_id)
+    if not hall:
+        raise ValueError("Selected hall does not exist")
+    if await is_overlapping(db, res_in.hall_id, res_in.start_datetime, res_in.end_datetime):
         raise ValueError("Time slot overlaps an existing approved reservation")
 
     res = Reservation(
@@ -37,47 +129,40 @@ def create_reservation(db: Session, user_id: int, res_in: ReservationCreate) ->
         start_datetime=res_in.start_datetime,
         end_datetime=res_in.end_datetime,
         description=res_in.description,
-        status=ReservationStatus.PENDING
+        status=ReservationStatus.PENDING,
+        admin_message=None,
+        resources=await _load_resources(db, res_in.resource_ids)
     )
-
     db.add(res)
-    db.commit()
-    db.refresh(res)
-
-    # Attach resources via the association table insert()
-    for resource_id in res_in.resource_ids:
-        resource = db.query(Resource).filter(Resource.id == resource_id).first()
-        if resource:
-            db.execute(
-                ReservationResource.insert().values(
-                    reservation_id=res.id,
-                    resource_id=resource_id
-                )
-            )
+    await db.flush()
 
     # Notify admins
-    admin_notification = Notification(
-        user_id=None,
-        message=f"New reservation request for {res.hall.name}",
-    )
-    db.add(admin_notification)
+    await add_admin_notification(db, f"New reservation request for {hall.name}")
 
-    db.commit()
+    await db.commit()
+    reservations_created.inc()
+    invalidate_calendar(res, approved=False)
     return res
 
-def update_reservation(db: Session, reservation_id: int, res_in: ReservationUpdate, user_id: Optional[int] = None) -> Optional[Reservation]:
-    """Update an existing reservation if it belongs to the user and is PENDING."""
-    res = get_reservation(db, reservation_id)
+async def update_reservation(db: AsyncSession, reservation_id: int, res_in: ReservationUpdate, user_id: Optional[int] = None) -> Optional[Reservation]:
+    """Update an existing reservation if it belongs to the user and is PENDING.
+
+    The resource rows are diffed against the current ones, so only added and
+    removed associations are written, each set in one batch.
+    """
+    res = await get_reservation(db, reservation_id)
     if not res or (user_id is not None and res.user_id != user_id):
         return None
     if res.status != ReservationStatus.PENDING:
         raise ValueError("Cannot modify a reservation that is not in PENDING status")
+    if res_in.hall_id != res.hall_id and not await crud_reference.get_hall(db, res_in.hall_id):
+        raise ValueError("Selected hall does not exist")
 
     # If timing or hall changed, re-check overlap
     if (res_in.hall_id != res.hall_id or
         res_in.start_datetime != res.start_datetime or
         res_in.end_datetime != res.end_datetime):
-        if is_overlapping(db, res_in.hall_id, res_in.start_datetime, res_in.end_datetime, exclude_id=reservation_id):
+        if await is_overlapping(db, res_in.hall_id, res_in.start_datetime, res_in.end_datetime, exclude_id=reservation_id):
             raise ValueError("Time slot overlaps an existing approved reservation")
 
     # Update core fields
@@ -86,107 +171,326 @@ def update_reservation(db: Session, reservation_id: int, res_in: ReservationUpda
     res.end_datetime = res_in.end_datetime
     res.description = res_in.description
 
-    # Remove old resources
-    db.execute(
-        ReservationResource.delete().where(
-            ReservationResource.c.reservation_id == res.id
-        )
-    )
-
-    # Insert new resources
-    for resource_id in res_in.resource_ids:
-        db.execute(
-            ReservationResource.insert().values(
-                reservation_id=res.id,
-                resource_id=resource_id
-            )
-        )
+    current = {resource.id: resource for resource in res.resources}
+    wanted = set(res_in.resource_ids)
+    if wanted != set(current):
+        added = await _load_resources(db, [resource_id for resource_id in wanted if resource_id not in current])
+        res.resources = [resource for resource_id, resource in current.items() if resource_id in wanted] + added
 
-    db.commit()
-    db.refresh(res)
+    await db.commit()
+    invalidate_calendar(res, approved=False)
     return res
 
-def cancel_reservation(db: Session, reservation_id: int, user_id: int) -> Optional[Reservation]:
+async def cancel_reservation(db: AsyncSession, reservation_id: int, user_id: int) -> Optional[Reservation]:
     """Cancel a reservation if it belongs to the user."""
-    res = get_reservation(db, reservation_id)
+    res = await get_reservation(db, reservation_id)
     if not res or res.user_id != user_id:
         return None
-    
+
     if res.status not in (ReservationStatus.PENDING, ReservationStatus.APPROVED):
         raise ValueError("Cannot cancel a reservation that is not PENDING or APPROVED")
 
     # Store the previous status to check if it was approved
     was_approved = res.status == ReservationStatus.APPROVED
-    
+
     # Update the status to CANCELLED
     res.status = ReservationStatus.CANCELLED
-    
+
     # Create appropriate notification based on previous status
     notification_message = ""
     if was_approved:
         notification_message = f"ALERT: Reservation #{res.id} for {res.hall.name} was CANCELLED after being APPROVED"
     else:
         notification_message = f"Reservation #{res.id} for {res.hall.name} has been cancelled by the user"
-    
+
     # Create notification for all admins
-    admin_users = db.query(User).filter(User.is_admin == True).all()
-    for admin in admin_users:
-        admin_notification = Notification(
-            user_id=admin.id,
-            message=notification_message,
-            is_read=False
-        )
-        db.add(admin_notification)
+    await add_admin_notification(db, notification_message)
 
-    db.commit()
-    db.refresh(res)
+    await db.commit()
+    reservations_cancelled.inc()
+    await db.refresh(res)
+    if was_approved:
+        approved_index.discard(res.id)
+    invalidate_calendar(res, approved=was_approved)
     return res
 
-def approve_reservation(db: Session, reservation_id: int, admin_id: int, admin_message: Optional[str] = None) -> Optional[Reservation]:
-    """Approve a reservation by an admin."""
-    res = get_reservation(db, reservation_id)
+async def lock_halls(db: AsyncSession, hall_ids) -> None:
+    """Hold the rows of `hall_ids` with SELECT ... FOR UPDATE until the transaction ends.
+
+    Serializes approvals per hall across workers. SQLite has no row locks and
+    ignores FOR UPDATE; there, `hall_locks` serializes them within the worker.
+    """
+    await db.execute(
+        select(Hall.id).where(Hall.id.in_(sorted(set(hall_ids)))).order_by(Hall.id).with_for_update()
+    )
+
+async def approve_reservation(db: AsyncSession, reservation_id: int, admin_id: int, admin_message: Optional[str] = None) -> Optional[Reservation]:
+    """Approve a reservation by an admin.
+
+    The overlap check and the update run under the hall's lock, in process
+    and in the database, so two admins approving overlapping requests at the
+    same time cannot both succeed.
+    """
+    res = await get_reservation(db, reservation_id)
     if not res or res.status != ReservationStatus.PENDING:
         return None
-    if is_overlapping(db, res.hall_id, res.start_datetime, res.end_datetime, exclude_id=res.id):
-        raise ValueError("Time slot now overlaps with another approved reservation")
 
-    res.status = ReservationStatus.APPROVED
-    res.admin_message = admin_message
+    hall_id = res.hall_id
+    async with hall_locks.hold(hall_id):
+        await lock_halls(db, [hall_id])
+        # Re-read under the lock: another admin may have decided it meanwhile
+        await db.refresh(res, ["status", "hall_id", "start_datetime", "end_datetime"], with_for_update=True)
+        if res.status != ReservationStatus.PENDING:
+            await db.rollback()
+            return None
+        if res.hall_id != hall_id:
+            await db.rollback()
+            raise ValueError("The reservation was moved to another hall meanwhile; retry")
+        if await is_overlapping(db, res.hall_id, res.start_datetime, res.end_datetime, exclude_id=res.id, verify=True):
+            await db.rollback()
+            raise ValueError("Time slot now overlaps with another approved reservation")
 
-    user_notification = Notification(
-        user_id=res.user_id,
-        message=f"Your reservation for {res.hall.name} has been approved.",
-    )
-    db.add(user_notification)
+        res.status = ReservationStatus.APPROVED
+        res.admin_message = admin_message
 
-    db.commit()
-    db.refresh(res)
+        # the owner may have been deleted (user_id SET NULL); no one to notify
+        if res.user_id is not None:
+            await add_notification(db, res.user_id, f"Your reservation for {res.hall.name} has been approved.")
+
+        await db.commit()
+        approved_index.add(res.id, res.hall_id, res.start_datetime, res.end_datetime)
+    reservations_approved.inc()
+    await db.refresh(res)
+    invalidate_calendar(res)
     return res
 
-def deny_reservation(db: Session, reservation_id: int, admin_id: int, admin_message: Optional[str] = None) -> Optional[Reservation]:
+async def deny_reservation(db: AsyncSession, reservation_id: int, admin_id: int, admin_message: Optional[str] = None) -> Optional[Reservation]:
     """Deny a reservation by an admin."""
-    res = get_reservation(db, reservation_id)
+    res = await get_reservation(db, reservation_id)
     if not res or res.status != ReservationStatus.PENDING:
         return None
 
     res.status = ReservationStatus.DENIED
     res.admin_message = admin_message
 
-    user_notification = Notification(
-        user_id=res.user_id,
-        message=f"Your reservation for {res.hall.name} has been denied. Reason: {admin_message or 'No reason provided'}",
-    )
-    db.add(user_notification)
+    if res.user_id is not None:
+        await add_notification(
+            db,
+            res.user_id,
+            f"Your reservation for {res.hall.name} has been denied. Reason: {admin_message or 'No reason provided'}"
+        )
 
-    db.commit()
-    db.refresh(res)
+    await db.commit()
+    reservations_denied.inc()
+    await db.refresh(res)
+    invalidate_calendar(res, approved=False)
     return res
 
-def get_overlapping_reservations(db: Session, hall_id: int, start_dt: datetime, end_dt: datetime) -> List[Reservation]:
+async def decide_reservations(db: AsyncSession, decisions: List[ReservationDecision], admin_id: int, atomic: bool = False) -> Dict:
+    """Approve and deny many PENDING reservations in one transaction.
+
+    The reservations are loaded with one query and the approvals checked in
+    memory against the halls' approved reservations (one range query) and
+    against each other, in request order: an approval that overlaps one
+    accepted earlier in the batch is rejected. Then one UPDATE per distinct
+    (status, message) pair applies the accepted decisions and one INSERT
+    stages the users' notifications.
+    Returns the approved / denied / rejected counts and one outcome per
+    decision, in request order; decisions that were not applied carry an
+    `error`. With `atomic`, nothing is applied unless every decision can be.
+
+    Runs under the locks of every hall involved, like approve_reservation.
+    """
+    ids = [decision.reservation_id for decision in decisions]
+    hall_ids = (await db.execute(
+        select(Reservation.hall_id).where(Reservation.id.in_(ids)).distinct()
+    )).scalars().all()
+    async with hall_locks.hold(*hall_ids):
+        await lock_halls(db, hall_ids)
+        return await _decide_locked(db, decisions, set(hall_ids), atomic)
+
+async def _decide_locked(db: AsyncSession, decisions: List[ReservationDecision], locked_halls: Set[int], atomic: bool) -> Dict:
+    ids = [decision.reservation_id for decision in decisions]
+    rows = {
+        row.id: row
+        for row in (await db.execute(
+            select(
+                Reservation.id,
+                Reservation.user_id,
+                Reservation.hall_id,
+                Reservation.start_datetime,
+                Reservation.end_datetime,
+                Reservation.status,
+                Hall.name.label("hall_name"),
+            )
+            .outerjoin(Hall, Reservation.hall_id == Hall.id)
+            .where(Reservation.id.in_(ids))
+            .with_for_update()
+        )).all()
+    }
+
+    outcomes = []
+    approvals = []
+    for decision in decisions:
+        row = rows.get(decision.reservation_id)
+        outcome = {"reservation_id": decision.reservation_id, "applied": False, "status": row.status if row else None}
+        if row is None:
+            outcome["error"] = "Reservation not found"
+        elif row.status != ReservationStatus.PENDING:
+            outcome["error"] = "Reservation is not PENDING"
+        elif decision.status == ReservationStatus.APPROVED and row.hall_id not in locked_halls:
+            outcome["error"] = "Reservation was moved to another hall meanwhile"
+        elif decision.status == ReservationStatus.APPROVED:
+            approvals.append((decision, outcome))
+        outcomes.append(outcome)
+
+    if approvals:
+        approved = [rows[decision.reservation_id] for decision, _ in approvals]
+        existing = await db.execute(
+            select(
+                Reservation.id, Reservation.hall_id, Reservation.start_datetime, Reservation.end_datetime
+            ).where(
+                Reservation.hall_id.in_({row.hall_id for row in approved}),
+                Reservation.status == ReservationStatus.APPROVED,
+                Reservation.start_datetime < max(row.end_datetime for row in approved),
+                Reservation.end_datetime > min(row.start_datetime for row in approved)
+            ).with_for_update(read=True)
+        )
+        taken = HallIntervalIndex()
+        taken.load(existing.all())
+        for (decision, outcome), row in zip(approvals, approved):
+            conflicting = taken.find_overlaps(row.hall_id, row.start_datetime, row.end_datetime)
+            if conflicting:
+                outcome["error"] = "Time slot overlaps with another approved reservation"
+                outcome["conflicting_ids"] = conflicting
+            else:
+                taken.add(row.id, row.hall_id, row.start_datetime, row.end_datetime)
+
+    accepted = [
+        (decision, rows[decision.reservation_id])
+        for decision, outcome in zip(decisions, outcomes)
+        if "error" not in outcome
+    ]
+    if atomic and len(accepted) < len(decisions):
+        return {"approved": 0, "denied": 0, "rejected": len(decisions), "outcomes": outcomes}
+    report = {
+        "approved": sum(1 for decision, _ in accepted if decision.status == ReservationStatus.APPROVED),
+        "denied": sum(1 for decision, _ in accepted if decision.status == ReservationStatus.DENIED),
+        "rejected": len(decisions) - len(accepted),
+        "outcomes": outcomes,
+    }
+    if not accepted:
+        return report
+
+    # One UPDATE per distinct (status, message): usually one or two, and
+    # unlike a CASE over every id it does not grow quadratically with the batch
+    groups: Dict[Tuple, List[int]] = {}
+    for decision, _ in accepted:
+        groups.setdefault((decision.status, decision.admin_message), []).append(decision.reservation_id)
+    updated = 0
+    for (new_status, admin_message), group_ids in groups.items():
+        result = await db.execute(
+            update(Reservation)
+            .where(Reservation.id.in_(group_ids), Reservation.status == ReservationStatus.PENDING)
+            .values(status=new_status, admin_message=admin_message)
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    if updated != len(accepted):
+        await db.rollback()
+        raise ValueError("Some of the reservations were decided concurrently; reload and retry")
+
+    await add_notifications(db, [
+        (
+            row.user_id,
+            f"Your reservation for {row.hall_name} has been approved."
+            if decision.status == ReservationStatus.APPROVED
+            else f"Your reservation for {row.hall_name} has been denied. Reason: {decision.admin_message or 'No reason provided'}"
+        )
+        for decision, row in accepted
+        if row.user_id is not None
+    ])
+    await db.commit()
+    reservations_approved.inc(report["approved"])
+    reservations_denied.inc(report["denied"])
+
+    for decision, row in accepted:
+        approved = decision.status == ReservationStatus.APPROVED
+        if approved:
+            approved_index.add(row.id, row.hall_id, row.start_datetime, row.end_datetime)
+        invalidate_calendar(row, approved=approved)
+    decided = {decision.reservation_id: decision.status for decision, _ in accepted}
+    for outcome in outcomes:
+        if "error" not in outcome:
+            outcome["applied"] = True
+            outcome["status"] = decided[outcome["reservation_id"]]
+    return report
+
+async def get_overlapping_reservations(db: AsyncSession, hall_id: int, start_dt: datetime, end_dt: datetime) -> List[Reservation]:
     """Get list of approved reservations overlapping a given period."""
-    return db.query(Reservation).filter(
-        Reservation.hall_id == hall_id,
-        Reservation.status == ReservationStatus.APPROVED,
-        Reservation.start_datetime < end_dt,
-        Reservation.end_datetime > start_dt
-    ).all()
+    result = await db.execute(
+        select(Reservation).where(
+            Reservation.hall_id == hall_id,
+            Reservation.status == ReservationStatus.APPROVED,
+            Reservation.start_datetime < end_dt,
+            Reservation.end_datetime > start_dt
+        )
+    )
+    return result.scalars().all()
+
+async def check_slots_availability(db: AsyncSession, slots: List[AvailabilitySlot]) -> List[List[int]]:
+    """Return the ids of approved reservations conflicting with each slot.
+
+    Runs one range query per hall covering all of that hall's slots and
+    matches the slots against the result in memory.
+    """
+    slots_by_hall = {}
+    for i, slot in enumerate(slots):
+        slots_by_hall.setdefault(slot.hall_id, []).append(i)
+
+    conflicts: List[List[int]] = [[] for _ in slots]
+    for hall_id, indices in slots_by_hall.items():
+        windows = [
+            (normalize_dt(slots[i].start_datetime), normalize_dt(slots[i].end_datetime))
+            for i in indices
+        ]
+        result = await db.execute(
+            select(
+                Reservation.start_datetime, Reservation.end_datetime, Reservation.id
+            ).where(
+                Reservation.hall_id == hall_id,
+                Reservation.status == ReservationStatus.APPROVED,
+                Reservation.start_datetime < max(end for _, end in windows),
+                Reservation.end_datetime > min(start for start, _ in windows)
+            )
+        )
+        intervals = [tuple(row) for row in result.all()]
+        for i, ids in zip(indices, sweep_conflicts(intervals, windows)):
+            conflicts[i] = [rid for rid in ids if rid != slots[i].exclude_id]
+    return conflicts
+
+async def get_approved_intervals(db: AsyncSession, hall_ids: List[int], start_dt: datetime, end_dt: datetime) -> Dict[int, List[Tuple[datetime, datetime]]]:
+    """Load the APPROVED intervals of several halls within a window in one query."""
+    result = await db.execute(
+        select(
+            Reservation.hall_id, Reservation.start_datetime, Reservation.end_datetime
+        ).where(
+            Reservation.hall_id.in_(hall_ids),
+            Reservation.status == ReservationStatus.APPROVED,
+            Reservation.start_datetime < end_dt,
+            Reservation.end_datetime > start_dt
+        )
+    )
+    intervals: Dict[int, List[Tuple[datetime, datetime]]] = {hall_id: [] for hall_id in hall_ids}
+    for hall_id, start, end in result.all():
+        intervals[hall_id].append((start, end))
+    return intervals
+
+async def find_free_slots(db: AsyncSession, hall_ids: List[int], start_dt: datetime, end_dt: datetime, duration: timedelta, granularity: timedelta) -> Dict[int, List[Tuple[datetime, datetime]]]:
+    """Return the free gaps of each hall in [start_dt, end_dt) that fit `duration`."""
+    start_dt, end_dt = normalize_dt(start_dt), normalize_dt(end_dt)
+    busy = await get_approved_intervals(db, hall_ids, start_dt, end_dt)
+    return {
+        hall_id: free_gaps(intervals, start_dt, end_dt, duration, granularity)
+        for hall_id, intervals in busy.items()
+    }
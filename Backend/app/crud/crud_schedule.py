@@ -0,0 +1,157 @@
+import hashlib
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+
+from app.core.intervals import normalize_dt, sweep_conflicts
+from app.core.scheduling import Candidate, max_weight_schedule
+from app.crud.crud_reservation import decide_reservations
+from app.models import Reservation, ReservationStatus
+from app.schemas import ReservationDecision
+
+# What a plan maximizes (ties broken as in _weight)
+SCHEDULE_WEIGHTS = ("count", "age", "duration")
+
+DEFAULT_DENY_MESSAGE = "The time slot is no longer available."
+
+def _waited(row, newest: datetime, oldest: datetime) -> float:
+    # seconds waited relative to the newest candidate, so a plan does not
+    # change just because time passed between preview and apply; legacy rows
+    # without created_at count as the oldest
+    return (newest - (row.created_at or oldest)).total_seconds()
+
+def _weight(row, weight: str, newest: datetime, oldest: datetime) -> tuple:
+    if weight == "age":
+        return _waited(row, newest, oldest) + 1, 1
+    if weight == "duration":
+        return (row.end_datetime - row.start_datetime).total_seconds(), 1
+    # most requests, then the oldest ones
+    return 1, _waited(row, newest, oldest)
+
+def _entry(row, conflicting_ids: List[int]) -> Dict:
+    # JSON-ready: a plan can have thousands of entries, too many to run
+    # through response-model validation
+    return {
+        "reservation_id": row.id,
+        "user_id": row.user_id,
+        "start_datetime": row.start_datetime.isoformat(),
+        "end_datetime": row.end_datetime.isoformat(),
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "conflicting_ids": conflicting_ids,
+    }
+
+async def plan_schedule(db: AsyncSession, hall_id: int, start_dt: datetime, end_dt: datetime, weight: str = "count") -> Dict:
+    """Split the hall's PENDING requests starting in [start_dt, end_dt) into approvals and denials.
+
+    Requests that overlap an APPROVED reservation are denied outright; of
+    the rest, the non-overlapping subset with the largest total `weight` is
+    approved and everything it displaces denied. Two queries, then
+    O(n log n) in memory. `plan_id` identifies the outcome, so an apply can
+    insist on the plan that was previewed. The plan is returned ready for
+    json.dumps.
+    """
+    if weight not in SCHEDULE_WEIGHTS:
+        raise ValueError(f"Weight must be one of {', '.join(SCHEDULE_WEIGHTS)}")
+    start_dt, end_dt = normalize_dt(start_dt), normalize_dt(end_dt)
+    pending = (await db.execute(
+        select(
+            Reservation.id,
+            Reservation.user_id,
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+            Reservation.created_at,
+        ).where(
+            Reservation.hall_id == hall_id,
+            Reservation.status == ReservationStatus.PENDING,
+            Reservation.start_datetime >= start_dt,
+            Reservation.start_datetime < end_dt
+        ).order_by(Reservation.start_datetime, Reservation.id)
+    )).all()
+
+    approve, deny = [], []
+    if pending:
+        approved = (await db.execute(
+            select(
+                Reservation.start_datetime, Reservation.end_datetime, Reservation.id
+            ).where(
+                Reservation.hall_id == hall_id,
+                Reservation.status == ReservationStatus.APPROVED,
+                Reservation.start_datetime < max(row.end_datetime for row in pending),
+                Reservation.end_datetime > min(row.start_datetime for row in pending)
+            )
+        )).all()
+        blocked = sweep_conflicts(
+            [tuple(row) for row in approved],
+            [(row.start_datetime, row.end_datetime) for row in pending]
+        )
+        free = [row for row, ids in zip(pending, blocked) if not ids]
+        deny.extend(_entry(row, ids) for row, ids in zip(pending, blocked) if ids)
+
+        created = [row.created_at for row in free if row.created_at is not None]
+        # with no timestamps at all every request counts as equally old
+        newest = max(created, default=datetime.min)
+        oldest = min(created, default=datetime.min)
+        chosen = set(max_weight_schedule([
+            Candidate(row.id, row.start_datetime, row.end_datetime, _weight(row, weight, newest, oldest))
+            for row in free
+        ]))
+        winners = [row for row in free if row.id in chosen]
+        approve.extend(_entry(row, []) for row in winners)
+        losers = [row for row in free if row.id not in chosen]
+        displaced_by = sweep_conflicts(
+            [(row.start_datetime, row.end_datetime, row.id) for row in winners],
+            [(row.start_datetime, row.end_datetime) for row in losers]
+        )
+        deny.extend(_entry(row, ids) for row, ids in zip(losers, displaced_by))
+        deny.sort(key=lambda entry: (entry["start_datetime"], entry["reservation_id"]))  # ISO strings sort by time
+
+    digest = hashlib.sha1(repr((
+        [entry["reservation_id"] for entry in approve],
+        [entry["reservation_id"] for entry in deny],
+    )).encode()).hexdigest()
+    return {
+        "hall_id": hall_id,
+        "weight": weight,
+        "plan_id": digest,
+        "approve": approve,
+        "deny": deny,
+        "applied": False,
+    }
+
+async def apply_schedule(
+    db: AsyncSession,
+    hall_id: int,
+    start_dt: datetime,
+    end_dt: datetime,
+    admin_id: int,
+    weight: str = "count",
+    plan_id: Optional[str] = None,
+    deny_message: Optional[str] = None
+) -> Dict:
+    """Recompute the plan and apply it in one transaction.
+
+    Raises ValueError if `plan_id` is given and the plan no longer matches
+    it, or if any of its reservations was decided concurrently.
+    """
+    plan = await plan_schedule(db, hall_id, start_dt, end_dt, weight)
+    if plan_id is not None and plan_id != plan["plan_id"]:
+        raise ValueError("The pending requests changed since the plan was previewed; preview it again")
+    decisions = [
+        ReservationDecision(reservation_id=entry["reservation_id"], status=ReservationStatus.APPROVED)
+        for entry in plan["approve"]
+    ] + [
+        ReservationDecision(
+            reservation_id=entry["reservation_id"],
+            status=ReservationStatus.DENIED,
+            admin_message=deny_message or DEFAULT_DENY_MESSAGE
+        )
+        for entry in plan["deny"]
+    ]
+    if decisions:
+        report = await decide_reservations(db, decisions, admin_id, atomic=True)
+        if report["rejected"]:
+            # a concurrent decision got in between planning and applying
+            raise ValueError("The pending requests changed while the plan was applied; preview it again")
+    plan["applied"] = True
+    return plan
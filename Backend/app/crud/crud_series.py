@@ -0,0 +1,120 @@
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+
+from app.core.intervals import normalize_dt
+from app.core.recurrence import expand_occurrences
+from app.core.telemetry import reservations_created
+from app.crud import crud_reference
+from app.crud.crud_calendar import invalidate_user_feed
+from app.crud.crud_notification import add_admin_notification
+from app.crud.crud_reservation import check_slots_availability
+from app.models import Reservation, ReservationSeries, ReservationStatus, reservation_resources as ReservationResource
+from app.schemas import AvailabilitySlot, ReservationSeriesCreate
+
+def expand_series(series_in: ReservationSeriesCreate) -> List[Tuple]:
+    """(start, end) of every occurrence of `series_in`; raises ValueError if it is invalid."""
+    return expand_occurrences(
+        normalize_dt(series_in.start_datetime),
+        normalize_dt(series_in.end_datetime),
+        series_in.frequency,
+        interval=series_in.interval,
+        weekdays=series_in.weekdays,
+        until=normalize_dt(series_in.until) if series_in.until else None,
+        count=series_in.count,
+        exdates=series_in.exdates,
+    )
+
+async def create_series(
+    db: AsyncSession,
+    user_id: int,
+    series_in: ReservationSeriesCreate,
+    dry_run: bool = False,
+    skip_conflicts: bool = False
+) -> Tuple[Optional[ReservationSeries], List[Dict]]:
+    """Create a recurring series and its occurrences as PENDING reservations.
+
+    Every occurrence is checked against the hall's approved reservations with
+    one range query, and all of them are inserted with one bulk statement in a
+    single transaction. Returns the series (None if nothing was created) and a
+    per-occurrence report. An occurrence that conflicts blocks the whole series
+    unless `skip_conflicts`, which creates only the free ones.
+    """
+    occurrences = expand_series(series_in)
+    if not occurrences:
+        raise ValueError("The series has no occurrences")
+
+    conflicts = await check_slots_availability(db, [
+        AvailabilitySlot(hall_id=series_in.hall_id, start_datetime=start, end_datetime=end)
+        for start, end in occurrences
+    ])
+    report = [
+        {"start_datetime": start, "end_datetime": end, "available": not ids, "conflicting_ids": ids}
+        for (start, end), ids in zip(occurrences, conflicts)
+    ]
+    free = [entry for entry in report if entry["available"]]
+    if dry_run or not free or (len(free) < len(report) and not skip_conflicts):
+        return None, report
+
+    series = ReservationSeries(
+        user_id=user_id,
+        hall_id=series_in.hall_id,
+        start_datetime=normalize_dt(series_in.start_datetime),
+        end_datetime=normalize_dt(series_in.end_datetime),
+        frequency=series_in.frequency,
+        interval=series_in.interval,
+        weekdays=series_in.weekdays,
+        until=normalize_dt(series_in.until) if series_in.until else None,
+        count=series_in.count,
+        exdates=[day.isoformat() for day in series_in.exdates] or None,
+        description=series_in.description,
+    )
+    db.add(series)
+    await db.flush()
+
+    await db.execute(insert(Reservation), [
+        {
+            "user_id": user_id,
+            "hall_id": series_in.hall_id,
+            "start_datetime": entry["start_datetime"],
+            "end_datetime": entry["end_datetime"],
+            "description": series_in.description,
+            "status": ReservationStatus.PENDING,
+            "series_id": series.id,
+        }
+        for entry in free
+    ])
+    # executemany does not return ids; the occurrences are unique by start
+    created = dict((await db.execute(
+        select(Reservation.start_datetime, Reservation.id).where(Reservation.series_id == series.id)
+    )).all())
+    for entry in free:
+        entry["reservation_id"] = created.get(entry["start_datetime"])
+
+    snapshot = await crud_reference.get_snapshot(db)
+    resource_ids = [resource_id for resource_id in dict.fromkeys(series_in.resource_ids) if resource_id in snapshot.resources]
+    if resource_ids:
+        await db.execute(ReservationResource.insert(), [
+            {"reservation_id": reservation_id, "resource_id": resource_id}
+            for reservation_id in created.values()
+            for resource_id in resource_ids
+        ])
+
+    hall = snapshot.halls.get(series_in.hall_id)
+    await add_admin_notification(
+        db,
+        f"New recurring reservation request for {hall.name if hall else 'a hall'} ({len(free)} occurrences)"
+    )
+    await db.commit()
+    reservations_created.inc(len(free))
+    invalidate_user_feed(user_id)
+    return series, report
+
+async def get_series(db: AsyncSession, series_id: int) -> Optional[ReservationSeries]:
+    return await db.get(ReservationSeries, series_id)
+
+async def get_series_reservations(db: AsyncSession, series_id: int) -> List[Reservation]:
+    result = await db.execute(
+        select(Reservation).where(Reservation.series_id == series_id).order_by(Reservation.start_datetime)
+    )
+    return result.scalars().all()
@@ -1,37 +1,78 @@
-from sqlalchemy.orm import Session
+import hashlib
+import secrets
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from typing import List, Optional
 
+from app.core.pagination import paginate
 from app.models import User
 from app.schemas import UserCreate
-from app.core.security import hash_password, verify_password
+from app.core.security import hash_password_async, verify_and_update_password_async
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
 
-def get_user(db: Session, user_id: int) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+USER_ORDER = (User.id,)
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    return db.query(User).offset(skip).limit(limit).all()
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[User]:
+    query = paginate(select(User), USER_ORDER, cursor, descending=False)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
-def create_user(db: Session, user_in: UserCreate, is_admin: bool = False) -> User:
+async def create_user(db: AsyncSession, user_in: UserCreate, is_admin: bool = False) -> User:
+    password_hash = await hash_password_async(user_in.password)
     user = User(
         email=user_in.email,
-        password_hash=hash_password(user_in.password),
+        password_hash=password_hash,
         student_number=user_in.student_number,
         full_name=user_in.full_name,
         is_admin=is_admin
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email=email)
+def _calendar_token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_calendar_token(db: AsyncSession, user_id: int) -> str:
+    """Give the user a new calendar feed token, revoking any earlier one.
+
+    Only its hash is stored, so the token is returned here and never again.
+    """
+    token = secrets.token_urlsafe(32)
+    user = await db.get(User, user_id)
+    user.calendar_token_hash = _calendar_token_hash(token)
+    await db.commit()
+    return token
+
+async def revoke_calendar_token(db: AsyncSession, user_id: int) -> None:
+    user = await db.get(User, user_id)
+    user.calendar_token_hash = None
+    await db.commit()
+
+async def get_user_id_by_calendar_token(db: AsyncSession, token: str) -> Optional[int]:
+    result = await db.execute(
+        select(User.id).where(User.calendar_token_hash == _calendar_token_hash(token))
+    )
+    return result.scalar()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email(db, email=email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = await verify_and_update_password_async(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash:
+        # Stored hash predates the current work factor
+        user.password_hash = new_hash
+        await db.commit()
     return user
@@ -0,0 +1,124 @@
+"""Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so changes to tables
+that already exist (new indexes, new columns) are applied here. Each migration
+runs once, in order, and is recorded in the `schema_version` table. Migrations
+must be safe to run against a database freshly created from the current
+models, where the change may already be present.
+"""
+from datetime import datetime
+import logging
+from typing import List
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from app.models import Notification, Reservation, ReservationSeries, User
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_index_if_missing(conn: Connection, table: Table, name: str) -> None:
+    """Create the index `name` declared on the model `table` unless it already exists."""
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+    if name not in existing:
+        index = next(ix for ix in table.indexes if ix.name == name)
+        index.create(conn)
+
+
+def _add_column_if_missing(conn: Connection, table: Table, name: str) -> bool:
+    """Add the model column `name` to `table` unless it exists; returns True if added."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    if name in existing:
+        return False
+    column_ddl = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+    return True
+
+
+# --- MIGRATIONS -------------------------------------------------------------
+
+def _add_hot_query_indexes(conn: Connection) -> None:
+    for table, name in (
+        (Reservation.__table__, "ix_reservations_hall_status_start_end"),
+        (Reservation.__table__, "ix_reservations_user_created"),
+        (Notification.__table__, "ix_notifications_user_created"),
+        (Notification.__table__, "ix_notifications_user_read_created"),
+    ):
+        _create_index_if_missing(conn, table, name)
+
+
+def _add_unread_notification_counter(conn: Connection) -> None:
+    users = User.__table__
+    notifications = Notification.__table__
+    _add_column_if_missing(conn, users, "unread_notifications")
+    unread = (
+        select(func.count())
+        .where(notifications.c.user_id == users.c.id, notifications.c.is_read == False)
+        .scalar_subquery()
+    )
+    conn.execute(users.update().values(unread_notifications=unread))
+
+
+def _add_reservation_series(conn: Connection) -> None:
+    ReservationSeries.__table__.create(conn, checkfirst=True)
+    # Added without its foreign key on existing databases: SQLite cannot add
+    # constraints to an existing table
+    _add_column_if_missing(conn, Reservation.__table__, "series_id")
+    _create_index_if_missing(conn, Reservation.__table__, "ix_reservations_series")
+
+
+def _add_calendar_feed_tokens(conn: Connection) -> None:
+    _add_column_if_missing(conn, User.__table__, "calendar_token_hash")
+    _create_index_if_missing(conn, User.__table__, "ix_users_calendar_token_hash")
+
+
+MIGRATIONS = [
+    (1, "Composite indexes for overlap checks, per-user lists and the notification feed", _add_hot_query_indexes),
+    (2, "Denormalized unread notification counter on users", _add_unread_notification_counter),
+    (3, "Recurring reservation series", _add_reservation_series),
+    (4, "Secret tokens for personal calendar feeds", _add_calendar_feed_tokens),
+]
+
+
+def pending_migrations(conn: Connection) -> List[int]:
+    """Versions of the migrations not yet applied to the database on `conn`."""
+    if not inspect(conn).has_table(schema_version.name):
+        return [version for version, _, _ in MIGRATIONS]
+    applied = set(conn.execute(select(schema_version.c.version)).scalars())
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+
+def run_migrations(conn: Connection) -> int:
+    """Apply pending migrations on `conn`; returns the number applied.
+
+    Runs from `python -m app.init_db`, once per deploy: migrations check
+    before they change anything, so concurrent runs would race.
+    """
+    schema_version.create(conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_version.c.version)).scalars())
+
+    count = 0
+    for version, description, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        upgrade(conn)
+        conn.execute(
+            schema_version.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            )
+        )
+        count += 1
+    return count
@@ -0,0 +1,44 @@
+import time
+from typing import Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.core.metrics import Counter, Histogram
+
+pool_wait_seconds = Histogram()
+pool_timeouts = Counter()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc()
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - start)
+
+
+def pool_status(pool: Pool) -> Dict:
+    """Current occupancy of `pool` and the checkout wait-time histogram."""
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # overflow() is negative while the base pool is not yet fully opened
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    status.update(
+        timeouts=pool_timeouts.value,
+        wait_seconds=pool_wait_seconds.snapshot(),
+    )
+    return status
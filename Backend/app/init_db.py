@@ -1,17 +1,24 @@
-from sqlalchemy.orm import Session
+import asyncio
+
+from sqlalchemy import select
 from app.db.session import SessionLocal, engine
+from app.db.migrations import run_migrations
 from app.models import Base, User, Hall, Resource
 from app.core.security import hash_password
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+async def create_tables():
+    # Create tables and apply pending migrations
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+
+async def init_db():
+    await create_tables()
 
-def init_db():
-    db = SessionLocal()
-    
-    try:
+    async with SessionLocal() as db:
         # Check if admin user exists
-        admin_user = db.query(User).filter(User.email == "admin@example.com").first()
+        result = await db.execute(select(User).where(User.email == "admin@example.com"))
+        admin_user = result.scalars().first()
         if not admin_user:
             # Create admin user
             admin_user = User(
@@ -21,23 +28,23 @@ def init_db():
                 is_admin=True  # Set admin flag
             )
             db.add(admin_user)
-            db.commit()
-            db.refresh(admin_user)
+            await db.commit()
+            await db.refresh(admin_user)
             print("Admin user created.")
         
         # Check if halls exist
-        halls = db.query(Hall).all()
+        halls = (await db.execute(select(Hall))).scalars().all()
         if not halls:
             # Create default halls
             function_hall = Hall(name="Function Hall", capacity=200)
             pe_hall = Hall(name="PE Hall", capacity=500)
             
             db.add_all([function_hall, pe_hall])
-            db.commit()
+            await db.commit()
             print("Default halls created.")
         
         # Check if resources exist
-        resources = db.query(Resource).all()
+        resources = (await db.execute(select(Resource))).scalars().all()
         if not resources:
             # Create default resources
             default_resources = [
@@ -50,13 +57,12 @@ def init_db():
             ]
             
             db.add_all(default_resources)
-            db.commit()
+            await db.commit()
             print("Default resources created.")
-            
-    finally:
-        db.close()
+
+    await engine.dispose()
 
 if __name__ == "__main__":
     print("Initializing database...")
-    init_db()
-    print("Database initialization completed.")
\ No newline at end of file
+    asyncio.run(init_db())
+    print("Database initialization completed.")
@@ -1,8 +1,19 @@
+import logging
 from fastapi import FastAPI
-from app.db.session import Base, engine
-from app.routers import auth, reservations, notifications, admin
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.db.migrations import pending_migrations
+from app.crud import crud_reservation
+from app.core.security import shutdown_password_hasher, start_password_hasher
+from app.core.pubsub import notification_hub
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.telemetry import MetricsMiddleware, instrument_engine
+from app.core.profiling import SQLProfilingMiddleware, profile_engine
+from app.routers import auth, reservations, notifications, admin, metrics
 from fastapi.middleware.cors import CORSMiddleware
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Hall Reservation System")
 # Allow frontend on localhost:3000
 origins = [
@@ -15,11 +26,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", "Server-Timing"],
 )
 
-# create tables
-Base.metadata.create_all(bind=engine)
+if settings.SQL_PROFILING_ENABLED:
+    app.add_middleware(SQLProfilingMiddleware, repeat_threshold=settings.SQL_PROFILING_REPEAT_THRESHOLD)
+    profile_engine(engine.sync_engine)
+
+# Metrics reveal routes, error rates and DB timings; never serve them anonymously
+metrics_enabled = settings.METRICS_ENABLED and bool(settings.METRICS_BEARER_TOKEN)
+if settings.METRICS_ENABLED and not metrics_enabled:
+    logger.warning("METRICS_ENABLED is set without METRICS_BEARER_TOKEN; /metrics is not served")
+
+if metrics_enabled:
+    # outermost, so the timings include the other middleware
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine.sync_engine)
+
+@app.on_event("startup")
+async def startup():
+    # The schema is created and migrated by `python -m app.init_db`, once per
+    # deploy; every worker doing it on startup would race on the first deploy
+    async with engine.connect() as conn:
+        pending = await conn.run_sync(pending_migrations)
+    if pending:
+        raise RuntimeError(
+            f"The database is missing schema migrations {pending}; run `python -m app.init_db` first"
+        )
+
+    async with SessionLocal() as db:
+        await crud_reservation.load_approved_index(db)
+
+    await notification_hub.start()
+    await start_password_hasher()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await notification_hub.stop()
+    shutdown_password_hasher()
+    await engine.dispose()
 
 
 # include routers
@@ -27,3 +72,5 @@ app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(reservations.router, prefix="", tags=["Reservations"])
 app.include_router(notifications.router, prefix="", tags=["Notifications"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+if metrics_enabled:
+    app.include_router(metrics.router, tags=["Metrics"])
@@ -11,6 +11,8 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     Table,
+    Index,
+    JSON,
 )
 from sqlalchemy.orm import relationship
 
@@ -31,6 +33,11 @@ class ReservationStatus(str, enum.Enum):
     CANCELLED = "CANCELLED"
 
 
+class RecurrenceFrequency(str, enum.Enum):
+    DAILY = "DAILY"
+    WEEKLY = "WEEKLY"
+
+
 # --- ASSOCIATION TABLE -----------------------------------------------------
 
 reservation_resources = Table(
@@ -59,6 +66,9 @@ reservation_resources = Table(
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_calendar_token_hash", "calendar_token_hash", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), nullable=False, unique=True, index=True)
@@ -67,6 +77,10 @@ class User(Base):
     full_name = Column(String(255), nullable=True)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Denormalized count of unread notifications, maintained by crud_notification
+    unread_notifications = Column(Integer, nullable=False, default=0, server_default="0")
+    # SHA-256 of the secret in the user's calendar feed URL; NULL while none is issued
+    calendar_token_hash = Column(String(64), nullable=True)
 
     # Relations
     reservations = relationship(
@@ -120,6 +134,12 @@ class Resource(Base):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # overlap predicate: hall_id, status, start_datetime < ?, end_datetime > ?
+        Index("ix_reservations_hall_status_start_end", "hall_id", "status", "start_datetime", "end_datetime"),
+        Index("ix_reservations_user_created", "user_id", "created_at"),
+        Index("ix_reservations_series", "series_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(
@@ -142,14 +162,22 @@ class Reservation(Base):
     admin_message = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     description = Column(Text, nullable=True)
+    # Set on the occurrences of a recurring series
+    series_id = Column(
+        Integer,
+        ForeignKey("reservation_series.id", ondelete="SET NULL"),
+        nullable=True,
+    )
 
-    # Relations
+    # Relations (hall and resources are part of every response, so load them
+    # eagerly; async sessions cannot lazy-load on attribute access)
     user = relationship("User", back_populates="reservations")
-    hall = relationship("Hall", back_populates="reservations")
+    hall = relationship("Hall", back_populates="reservations", lazy="selectin")
     resources = relationship(
         "Resource",
         secondary=reservation_resources,
         back_populates="reservations",
+        lazy="selectin",
     )
     feedback = relationship(
         "Feedback",
@@ -158,6 +186,41 @@ class Reservation(Base):
         cascade="all, delete-orphan",
         passive_deletes=True,
     )
+    series = relationship("ReservationSeries", back_populates="reservations")
+
+
+class ReservationSeries(Base):
+    """A recurring booking; each occurrence is stored as its own Reservation."""
+    __tablename__ = "reservation_series"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    hall_id = Column(
+        Integer,
+        ForeignKey("halls.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # first occurrence; later ones keep its time of day and length
+    start_datetime = Column(DateTime, nullable=False)
+    end_datetime = Column(DateTime, nullable=False)
+    frequency = Column(Enum(RecurrenceFrequency), nullable=False)
+    interval = Column(Integer, nullable=False, default=1)
+    weekdays = Column(JSON, nullable=True)  # WEEKLY only: 0 = Monday ... 6 = Sunday
+    until = Column(DateTime, nullable=True)
+    count = Column(Integer, nullable=True)
+    exdates = Column(JSON, nullable=True)  # ISO dates with no occurrence
+    description = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    reservations = relationship(
+        "Reservation",
+        back_populates="series",
+        passive_deletes=True,
+    )
 
 
 class Feedback(Base):
@@ -176,11 +239,15 @@ class Feedback(Base):
     
 
     # Relation
-    reservation = relationship("Reservation", back_populates="feedback")
+    reservation = relationship("Reservation", back_populates="feedback", lazy="selectin")
 
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(
@@ -1,17 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, raiseload
 from typing import List, Optional
 from datetime import datetime, timedelta
+import json
 import logging
 
+from app.core.conditional import is_not_modified, not_modified_response, validator_headers
 from app.core.deps import get_current_admin_user
-from app.db.session import get_db
-from app.crud import crud_reservation, crud_feedback, crud_notification, crud_user
-from app.models import User, Reservation, Hall, Resource
+from app.core.export import EXPORT_BATCH_SIZE, export_response
+from app.core.pagination import paginate, set_next_cursor
+from app.core.pubsub import notification_hub
+from app.core.security import password_hasher_status
+from app.db.session import get_db, engine
+from app.db.pool import pool_status
+from app.crud import crud_calendar, crud_reference, crud_reservation, crud_schedule, crud_feedback, crud_notification, crud_user
+from app.models import User, Reservation, Hall, Resource, Feedback, reservation_resources
 from app.schemas import (
     ReservationStatus, ReservationWithHallOut, 
     UserOut, FeedbackWithReservationOut,
-    ResourceCreate, ResourceOut, HallCreate, HallOut
+    ResourceCreate, ResourceOut, HallCreate, HallOut,
+    BulkDecisionRequest, BulkDecisionResult, AutoScheduleRequest, AutoSchedulePlanOut
 )
 
 # Configure logging
@@ -22,47 +33,58 @@ router = APIRouter()
 
 # --- User Management ---
 @router.get("/users", response_model=List[UserOut])
-def list_users(
+async def list_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all users (admin only)."""
-    return crud_user.get_users(db, skip=skip, limit=limit)
+    try:
+        users = await crud_user.get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    set_next_cursor(response, users, limit, crud_user.USER_ORDER)
+    return users
 
 # --- Resource Management ---
 @router.get("/resources", response_model=List[ResourceOut])
-def list_resources(
+async def list_resources(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all resources (admin only)."""
-    return db.query(Resource).offset(skip).limit(limit).all()
+    result = await db.execute(select(Resource).offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.post("/resources", response_model=ResourceOut)
-def create_resource(
+async def create_resource(
     resource: ResourceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new resource (admin only)."""
     db_resource = Resource(name=resource.name)
     db.add(db_resource)
-    db.commit()
-    db.refresh(db_resource)
+    await db.commit()
+    await db.refresh(db_resource)
     return db_resource
 
 @router.delete("/resources/{resource_id}", response_model=dict)
-def delete_resource(
+async def delete_resource(
     resource_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Delete a resource (admin only)."""
-    resource = db.query(Resource).filter(Resource.id == resource_id).first()
+    resource = await db.get(Resource, resource_id)
     
     if not resource:
         raise HTTPException(
@@ -70,65 +92,94 @@ def delete_resource(
             detail="Resource not found"
         )
     
-    db.delete(resource)
-    db.commit()
+    # Drop the associations explicitly instead of lazy-loading Resource.reservations
+    await db.execute(
+        delete(reservation_resources).where(reservation_resources.c.resource_id == resource_id)
+    )
+    await db.delete(resource)
+    await db.commit()
     return {"message": "Resource deleted successfully"}
 
 # --- Hall Management ---
 @router.get("/halls", response_model=List[HallOut])
-def list_halls(
+async def list_halls(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all halls (admin only)."""
-    return db.query(Hall).offset(skip).limit(limit).all()
+    result = await db.execute(select(Hall).offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.post("/halls", response_model=HallOut)
-def create_hall(
+async def create_hall(
     hall: HallCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new hall (admin only)."""
     db_hall = Hall(name=hall.name, capacity=hall.capacity if hasattr(hall, 'capacity') else None)
     db.add(db_hall)
-    db.commit()
-    db.refresh(db_hall)
+    await db.commit()
+    await db.refresh(db_hall)
     return db_hall
 
 # --- Reservation Management ---
+def _filter_reservations(query, status_filter: Optional[str], hall_id: Optional[int], start_date: Optional[datetime], end_date: Optional[datetime]):
+    """The filters shared by the reservation list and its export."""
+    if status_filter:
+        query = query.where(Reservation.status == status_filter)
+    
+    if hall_id:
+        query = query.where(Reservation.hall_id == hall_id)
+    
+    if start_date:
+        query = query.where(Reservation.start_datetime >= start_date)
+    
+    if end_date:
+        end_date_adjusted = end_date + timedelta(days=1)
+        query = query.where(Reservation.start_datetime <= end_date_adjusted)
+    return query
+
 @router.get("/reservations", response_model=List[dict])
-def list_all_reservations(
-    status: Optional[str] = None,
+async def list_all_reservations(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     hall_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all reservations with optional filters (admin only)."""
-    from sqlalchemy import outerjoin
-    
-    query = db.query(Reservation).join(User, Reservation.user_id == User.id).outerjoin(Hall, Reservation.hall_id == Hall.id)
-    
-    if status:
-        query = query.filter(Reservation.status == status)
-    
-    if hall_id:
-        query = query.filter(Reservation.hall_id == hall_id)
-    
-    if start_date:
-        query = query.filter(Reservation.start_datetime >= start_date)
+    # User and hall come from the joins of this one query; resources are not listed
+    query = (
+        select(Reservation)
+        .join(User, Reservation.user_id == User.id)
+        .outerjoin(Hall, Reservation.hall_id == Hall.id)
+        .options(
+            contains_eager(Reservation.user),
+            contains_eager(Reservation.hall),
+            raiseload(Reservation.resources),
+        )
+    )
+    query = _filter_reservations(query, status_filter, hall_id, start_date, end_date)
     
-    if end_date:
-        end_date_adjusted = end_date + timedelta(days=1)
-        query = query.filter(Reservation.start_datetime <= end_date_adjusted)
+    try:
+        query = paginate(query, crud_reservation.RESERVATION_ORDER, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    reservations = query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
+    reservations = result.scalars().all()
+    set_next_cursor(response, reservations, limit, crud_reservation.RESERVATION_ORDER)
     
     result = []
     for res in reservations:
@@ -164,16 +215,57 @@ def list_all_reservations(
     
     return result
 
+@router.get("/reservations/export", response_class=StreamingResponse)
+async def export_reservations(
+    export_format: str = Query("csv", alias="format", regex="^(csv|ndjson)$"),
+    gzip: bool = False,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    hall_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Export every reservation matching the list filters as CSV or NDJSON (admin only).
+
+    Rows are streamed from a server-side cursor; pass `gzip=true` for a
+    compressed download.
+    """
+    query = (
+        select(
+            Reservation.id,
+            Reservation.user_id,
+            User.email.label("user_email"),
+            User.full_name.label("user_full_name"),
+            User.student_number.label("user_student_number"),
+            Reservation.hall_id,
+            Hall.name.label("hall_name"),
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+            Reservation.status,
+            Reservation.description,
+            Reservation.admin_message,
+            Reservation.created_at,
+        )
+        .join(User, Reservation.user_id == User.id)
+        .outerjoin(Hall, Reservation.hall_id == Hall.id)
+    )
+    query = _filter_reservations(query, status_filter, hall_id, start_date, end_date)
+    result = await db.stream(
+        query.order_by(Reservation.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    return export_response(result.partitions(), list(result.keys()), export_format, "reservations", gzip=gzip)
+
 @router.put("/reservations/{reservation_id}/approve", response_model=ReservationWithHallOut)
-def approve_reservation(
+async def approve_reservation(
     reservation_id: int,
     admin_message: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Approve a reservation (admin only)."""
     try:
-        reservation = crud_reservation.approve_reservation(
+        reservation = await crud_reservation.approve_reservation(
             db=db, 
             reservation_id=reservation_id, 
             admin_id=current_user.id,
@@ -194,15 +286,15 @@ def approve_reservation(
         )
 
 @router.put("/reservations/{reservation_id}/deny", response_model=ReservationWithHallOut)
-def deny_reservation(
+async def deny_reservation(
     reservation_id: int,
     admin_message: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Deny a reservation (admin only)."""
     try:
-        reservation = crud_reservation.deny_reservation(
+        reservation = await crud_reservation.deny_reservation(
             db=db, 
             reservation_id=reservation_id, 
             admin_id=current_user.id,
@@ -222,58 +314,178 @@ def deny_reservation(
             detail=str(e)
         )
 
+@router.post("/reservations/bulk-decision", response_model=BulkDecisionResult)
+async def decide_reservations(
+    request: BulkDecisionRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Approve and deny many PENDING reservations at once (admin only).
+
+    Approvals are checked in the order given; one that overlaps an approved
+    reservation, or an approval earlier in the same request, is rejected and
+    reported with the conflicting ids. Every other decision is applied.
+    """
+    try:
+        return await crud_reservation.decide_reservations(
+            db=db,
+            decisions=request.decisions,
+            admin_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+@router.post("/halls/{hall_id}/auto-schedule", response_model=AutoSchedulePlanOut)
+async def auto_schedule(
+    hall_id: int,
+    request: AutoScheduleRequest,
+    apply: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Decide a hall's PENDING requests in a window automatically (admin only).
+
+    Approves the largest-weight set of non-overlapping requests (`weight`:
+    most requests, longest waiting, or most booked time) and denies the rest.
+    Returns the plan without changing anything unless `apply` is set; pass
+    the preview's `plan_id` when applying to make sure that plan is the one
+    applied. All decisions are applied in one transaction.
+    """
+    if not await crud_reference.get_hall(db, hall_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hall not found"
+        )
+
+    if not apply:
+        plan = await crud_schedule.plan_schedule(
+            db, hall_id, request.start_datetime, request.end_datetime, request.weight
+        )
+        return Response(content=json.dumps(plan), media_type="application/json")
+    try:
+        plan = await crud_schedule.apply_schedule(
+            db,
+            hall_id,
+            request.start_datetime,
+            request.end_datetime,
+            admin_id=current_user.id,
+            weight=request.weight,
+            plan_id=request.plan_id,
+            deny_message=request.deny_message
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    return Response(content=json.dumps(plan), media_type="application/json")
+
 # --- Feedback Management ---
 @router.get("/feedback", response_model=List[FeedbackWithReservationOut])
-def list_all_feedback(
+async def list_all_feedback(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all user feedback (admin only)."""
-    return crud_feedback.get_all_feedbacks(db, skip=skip, limit=limit)
+    try:
+        feedbacks = await crud_feedback.get_all_feedbacks(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    set_next_cursor(response, feedbacks, limit, crud_feedback.FEEDBACK_ORDER)
+    return feedbacks
+
+@router.get("/feedback/export", response_class=StreamingResponse)
+async def export_feedback(
+    export_format: str = Query("csv", alias="format", regex="^(csv|ndjson)$"),
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Export all feedback with its reservation, hall and author as CSV or NDJSON (admin only)."""
+    query = (
+        select(
+            Feedback.id,
+            Feedback.reservation_id,
+            Feedback.rating,
+            Feedback.comments,
+            Feedback.created_at,
+            Reservation.user_id,
+            User.email.label("user_email"),
+            Reservation.hall_id,
+            Hall.name.label("hall_name"),
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+        )
+        .join(Reservation, Feedback.reservation_id == Reservation.id)
+        .outerjoin(User, Reservation.user_id == User.id)
+        .outerjoin(Hall, Reservation.hall_id == Hall.id)
+        .order_by(Feedback.id)
+    )
+    result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    return export_response(result.partitions(), list(result.keys()), export_format, "feedback", gzip=gzip)
 
 # --- Calendar View ---
 @router.get("/calendar", response_model=List[dict])
 async def get_calendar_events(
+    request: Request,
     start_date: datetime = Query(..., description="Start date for calendar view"),
     end_date: datetime = Query(..., description="End date for calendar view"),
     hall_id: Optional[int] = Query(None, description="Filter by hall ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    """Get a list of approved reservations for calendar display"""
-    
-    APPROVED_STATUS = "APPROVED"
-    
-    query = db.query(Reservation).filter(
-        Reservation.status == APPROVED_STATUS,
-        Reservation.start_datetime >= start_date,
-        Reservation.end_datetime <= end_date
-    )
-    
-    if hall_id is not None:
-        query = query.filter(Reservation.hall_id == hall_id)
-    
-    reservations = query.all()
-    
-    events = []
-    for res in reservations:
-        hall = db.query(Hall).filter(Hall.id == res.hall_id).first()
-        hall_name = hall.name if hall else "Hall Unavailable"
-        hall_status = "active" if hall else "deleted"
-        
-        if not hall:
-            logger.warning(f"Calendar event for reservation {res.id} references missing hall_id {res.hall_id}")
-        
-        events.append({
-            "id": res.id,
-            "title": f"{res.description or 'Reservation'} - {hall_name}",
-            "start": res.start_datetime.isoformat(),
-            "end": res.end_datetime.isoformat(),
-            "user_id": res.user_id,
-            "hall_id": res.hall_id,
-            "hall_status": hall_status
-        })
-    
-    return events
\ No newline at end of file
+    """Get a list of approved reservations for calendar display.
+
+    Served from the per-month calendar cache; honours If-None-Match and
+    If-Modified-Since.
+    """
+    try:
+        calendar = await crud_calendar.get_calendar(db, start_date, end_date, hall_id=hall_id, admin=True)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    headers = validator_headers(calendar.etag, calendar.last_modified)
+    if is_not_modified(request, calendar.etag, calendar.last_modified):
+        return not_modified_response(headers)
+    return Response(content=calendar.body, media_type="application/json", headers=headers)
+
+# --- Diagnostics ---
+@router.get("/db/pool", response_model=dict)
+async def get_db_pool_status(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Connection pool occupancy and checkout wait times (admin only)."""
+    return pool_status(engine.sync_engine.pool)
+
+@router.get("/security/password-hasher", response_model=dict)
+async def get_password_hasher_status(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Password hashing pool load and queue depth (admin only)."""
+    return password_hasher_status()
+
+@router.get("/notifications/hub", response_model=dict)
+async def get_notification_hub_status(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Open notification streams and publish counts of this worker (admin only)."""
+    return notification_hub.status()
+
+@router.get("/reservations/approval-locks", response_model=dict)
+async def get_approval_lock_status(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Per-hall approval lock contention and wait times of this worker (admin only)."""
+    return crud_reservation.hall_locks.status()
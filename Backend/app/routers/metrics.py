@@ -0,0 +1,66 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from app.core.config import settings
+from app.core.metrics import Exposition
+from app.core.pubsub import notification_hub
+from app.core.security import password_hasher_status
+from app.core.telemetry import add_app_metrics
+from app.crud import crud_reservation
+from app.db.pool import pool_status
+from app.db.session import engine
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response appends the charset
+
+def _add_pool_metrics(exposition: Exposition):
+    pool = pool_status(engine.sync_engine.pool)
+    for key, help in (
+        ("size", "Connections the pool keeps open."),
+        ("checked_out", "Connections in use."),
+        ("idle", "Open connections waiting in the pool."),
+        ("overflow", "Connections open beyond the pool size."),
+    ):
+        if key in pool:
+            exposition.add(f"db_pool_{key}", "gauge", help, [({}, pool[key])])
+    exposition.add("db_pool_timeouts_total", "counter", "Checkouts that gave up waiting for a connection.", [({}, pool["timeouts"])])
+    exposition.add_histogram("db_pool_wait_seconds", "Time checkouts waited for a connection.", [({}, pool["wait_seconds"])])
+
+def _add_worker_metrics(exposition: Exposition):
+    hasher = password_hasher_status()
+    exposition.add("password_hash_running", "gauge", "Password hashes being computed.", [({}, hasher["running"])])
+    exposition.add("password_hash_queued", "gauge", "Password hashes waiting for a slot.", [({}, hasher["queued"])])
+    exposition.add("password_hash_rejections_total", "counter", "Logins and sign-ups turned away with a full hash queue.", [({}, hasher["rejections"])])
+    exposition.add_histogram("password_hash_wait_seconds", "Time password hashes waited for a slot.", [({}, hasher["wait_seconds"])])
+    exposition.add_histogram("password_hash_duration_seconds", "Time spent computing password hashes.", [({}, hasher["hash_seconds"])])
+
+    hub = notification_hub.status()
+    exposition.add("notification_streams", "gauge", "Open notification streams.", [({}, hub["streams"])])
+    exposition.add("notification_events_published_total", "counter", "Notification events published.", [({}, hub["published"])])
+    exposition.add("notification_stream_overflows_total", "counter", "Streams that fell behind and had to resync.", [({}, hub["overflows"])])
+
+    locks = crud_reservation.hall_locks.status()
+    exposition.add("approval_locks_held", "gauge", "Hall approval lock stripes currently held.", [({}, locks["held"])])
+    exposition.add("approval_lock_acquisitions_total", "counter", "Hall approval lock acquisitions.", [({}, locks["acquisitions"])])
+    exposition.add("approval_lock_contended_total", "counter", "Hall approval lock acquisitions that had to wait.", [({}, locks["contended"])])
+    exposition.add_histogram("approval_lock_wait_seconds", "Time spent waiting for hall approval locks.", [({}, locks["wait_seconds"])])
+
+@router.get("/metrics", response_class=Response, include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """Metrics of this worker in the Prometheus text format."""
+    if not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.METRICS_BEARER_TOKEN}"
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    exposition = Exposition()
+    add_app_metrics(exposition)
+    _add_pool_metrics(exposition)
+    _add_worker_metrics(exposition)
+    return Response(content=exposition.render(), media_type=CONTENT_TYPE)
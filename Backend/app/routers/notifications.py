@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Hashable, List, Optional, Tuple
 
+from app.core.conditional import is_not_modified, not_modified_response, validator_headers
+from app.core.config import settings
 from app.core.deps import get_current_active_user
-from app.db.session import get_db
+from app.core.pagination import set_next_cursor
+from app.core.pubsub import notification_hub
+from app.db.session import SessionLocal, get_db
 from app.crud import crud_notification
 from app.models import User, Notification
 from app.schemas import NotificationOut
@@ -11,21 +17,39 @@ from app.schemas import NotificationOut
 router = APIRouter()
 
 @router.get("/notifications", response_model=List[NotificationOut])
-def list_notifications(
-    db: Session = Depends(get_db),
+async def list_notifications(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """List all notifications for the current user."""
-    return crud_notification.get_user_notifications(db, user_id=current_user.id)
+    """List notifications for the current user, newest first.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
+    """
+    try:
+        notifications = await crud_notification.get_user_notifications(
+            db, user_id=current_user.id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    set_next_cursor(response, notifications, limit, crud_notification.NOTIFICATION_ORDER)
+    return notifications
 
 @router.put("/notifications/{notification_id}/read", response_model=NotificationOut)
-def mark_notification_as_read(
+async def mark_notification_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Mark a specific notification as read."""
-    notification = crud_notification.mark_notification_as_read(
+    notification = await crud_notification.mark_notification_as_read(
         db, 
         notification_id=notification_id, 
         user_id=current_user.id
@@ -40,20 +64,90 @@ def mark_notification_as_read(
     return notification
 
 @router.put("/notifications/read-all", response_model=dict)
-def mark_all_notifications_as_read(
-    db: Session = Depends(get_db),
+async def mark_all_notifications_as_read(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Mark all notifications for the current user as read."""
-    count = crud_notification.mark_all_notifications_as_read(db, user_id=current_user.id)
+    count = await crud_notification.mark_all_notifications_as_read(db, user_id=current_user.id)
     return {"message": f"Marked {count} notifications as read"}
 
 @router.get("/notifications/count", response_model=dict)
-def get_unread_notification_count(
-    db: Session = Depends(get_db),
+async def get_unread_notification_count(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get count of unread notifications for the current user."""
-    notifications = crud_notification.get_user_notifications(db, user_id=current_user.id)
-    unread_count = sum(1 for n in notifications if not n.is_read)
+    """Get count of unread notifications for the current user.
+
+    The response carries an ETag; polling clients that send it back in
+    `If-None-Match` get an empty 304 until the count changes.
+    """
+    unread_count = await crud_notification.get_unread_count(db, user_id=current_user.id)
+    etag = f'"{unread_count}"'
+    headers = validator_headers(etag)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    response.headers.update(headers)
     return {"unread_count": unread_count}
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _read_unread_count(user_id: int) -> int:
+    async with SessionLocal() as db:
+        return await crud_notification.get_unread_count(db, user_id=user_id)
+
+async def _notification_events(user_id: int, topics: Tuple[Hashable, ...]) -> AsyncIterator[str]:
+    # Subscribed here rather than in the endpoint, so a response that is
+    # never iterated holds no subscription; subscribing before reading the
+    # count means no notification falls between the two
+    subscription = notification_hub.subscribe(user_id, topics)
+    try:
+        unread_count = await _read_unread_count(user_id)
+        yield _sse("unread_count", {"unread_count": unread_count})
+        while True:
+            events = await subscription.get(timeout=settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS)
+            if events is None:
+                # comment line; keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield _sse("resync", {})
+            for event in events:
+                if event["type"] == "notification":
+                    yield _sse("notification", event["notification"])
+                elif event["type"] == "broadcast":
+                    # fanned-out rows are inserted in bulk, without their ids at hand
+                    yield _sse("resync", {})
+            # Re-read rather than track deltas so the count cannot drift
+            count = await _read_unread_count(subscription.user_id)
+            if count != unread_count:
+                unread_count = count
+                yield _sse("unread_count", {"unread_count": unread_count})
+    finally:
+        notification_hub.unsubscribe(subscription)
+
+@router.get("/notifications/stream")
+async def stream_notifications(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Server-Sent Events stream of the current user's notifications.
+
+    Sends `unread_count` on connect and whenever it changes, a `notification`
+    event for each new notification, and `resync` when the client should reload
+    its list instead (after notifications were inserted in bulk, or if it fell
+    too far behind).
+    """
+    topics = (crud_notification.ADMINS_TOPIC,) if current_user.is_admin else ()
+    # The request's session stays open until the stream ends; hand its
+    # connection back to the pool now so idle streams hold no connection
+    await db.close()
+    return StreamingResponse(
+        _notification_events(current_user.id, topics),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
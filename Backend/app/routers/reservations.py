@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
+from app.core.config import settings
+from app.core.conditional import is_not_modified, not_modified_response, validator_headers
 from app.core.deps import get_current_active_user, get_current_admin_user
+from app.core.pagination import set_next_cursor
 from app.db.session import get_db
-from app.crud import crud_reservation, crud_feedback, crud_notification
-from app.models import User, Reservation, Hall, Resource
+from app.crud import crud_calendar, crud_reference, crud_reservation, crud_series, crud_feedback, crud_notification, crud_user
+from app.models import User, Reservation, Hall
 from app.schemas import (
     ReservationCreate, ReservationUpdate, ReservationOut, 
-    ReservationWithHallOut, FeedbackCreate, FeedbackOut, FeedbackWithReservationOut
+    ReservationWithHallOut, FeedbackCreate, FeedbackOut, FeedbackWithReservationOut,
+    AvailabilityBatchRequest, AvailabilitySlotOut, FreeSlotOut, HallFreeSlotsOut,
+    ReservationSeriesCreate, ReservationSeriesOut, ReservationSeriesResult, CalendarTokenOut
 )
 
 # Configure logging
@@ -20,35 +28,151 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # --- Hall and Resource Endpoints ---
+def _reference_response(request: Request, body: bytes, etag: str) -> Response:
+    headers = validator_headers(etag, cache_control=f"public, max-age={settings.REFERENCE_DATA_MAX_AGE_SECONDS}")
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/halls", response_model=List[dict])
-def list_halls(db: Session = Depends(get_db)):
-    halls = db.query(Hall).all()
-    return [{"id": hall.id, "name": hall.name, "capacity": hall.capacity} for hall in halls]
+async def list_halls(request: Request, db: AsyncSession = Depends(get_db)):
+    snapshot = await crud_reference.get_snapshot(db)
+    return _reference_response(request, snapshot.halls_body, snapshot.halls_etag)
 
 @router.get("/resources", response_model=List[dict])
-def list_resources(db: Session = Depends(get_db)):
-    resources = db.query(Resource).all()
-    return [{"id": resource.id, "name": resource.name} for resource in resources]
+async def list_resources(request: Request, db: AsyncSession = Depends(get_db)):
+    snapshot = await crud_reference.get_snapshot(db)
+    return _reference_response(request, snapshot.resources_body, snapshot.resources_etag)
+
+MAX_FREE_SLOT_WINDOW = timedelta(days=92)
+
+def _validate_free_slot_window(start_dt: datetime, end_dt: datetime):
+    if end_dt <= start_dt:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must be after 'from'"
+        )
+    if end_dt - start_dt > MAX_FREE_SLOT_WINDOW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Search window cannot exceed {MAX_FREE_SLOT_WINDOW.days} days"
+        )
+
+@router.get("/halls/free-slots", response_model=List[HallFreeSlotsOut])
+async def find_free_slots_all_halls(
+    start_dt: datetime = Query(..., alias="from"),
+    end_dt: datetime = Query(..., alias="to"),
+    duration: int = Query(..., ge=1, description="Required length in minutes"),
+    granularity: int = Query(30, ge=1, description="Start times are multiples of this many minutes"),
+    attendees: Optional[int] = Query(None, ge=1, description="Only halls that can hold this many people"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Find free slots across all halls, best capacity fit first."""
+    _validate_free_slot_window(start_dt, end_dt)
+    halls = list((await crud_reference.get_snapshot(db)).halls.values())
+    if attendees is not None:
+        halls = [hall for hall in halls if hall.capacity is not None and hall.capacity >= attendees]
+    if not halls:
+        return []
+
+    free = await crud_reservation.find_free_slots(
+        db,
+        hall_ids=[hall.id for hall in halls],
+        start_dt=start_dt,
+        end_dt=end_dt,
+        duration=timedelta(minutes=duration),
+        granularity=timedelta(minutes=granularity)
+    )
+    # Smallest hall that still fits the group first, then the hall with the most free time
+    ranked = sorted(
+        (hall for hall in halls if free[hall.id]),
+        key=lambda hall: (
+            (hall.capacity or 0) - (attendees or 0),
+            -sum((end - start for start, end in free[hall.id]), timedelta(0))
+        )
+    )
+    return [
+        HallFreeSlotsOut(
+            hall_id=hall.id,
+            hall_name=hall.name,
+            capacity=hall.capacity,
+            free_slots=[FreeSlotOut(start_datetime=start, end_datetime=end) for start, end in free[hall.id]]
+        )
+        for hall in ranked
+    ]
+
+@router.get("/halls/{hall_id}/free-slots", response_model=List[FreeSlotOut])
+async def find_free_slots(
+    hall_id: int,
+    start_dt: datetime = Query(..., alias="from"),
+    end_dt: datetime = Query(..., alias="to"),
+    duration: int = Query(..., ge=1, description="Required length in minutes"),
+    granularity: int = Query(30, ge=1, description="Start times are multiples of this many minutes"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Find the free slots of a hall that fit the requested duration."""
+    _validate_free_slot_window(start_dt, end_dt)
+    hall = await crud_reference.get_hall(db, hall_id)
+    if not hall:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hall not found"
+        )
+
+    free = await crud_reservation.find_free_slots(
+        db,
+        hall_ids=[hall_id],
+        start_dt=start_dt,
+        end_dt=end_dt,
+        duration=timedelta(minutes=duration),
+        granularity=timedelta(minutes=granularity)
+    )
+    return [FreeSlotOut(start_datetime=start, end_datetime=end) for start, end in free[hall_id]]
 
 # --- Reservation Endpoints ---
 @router.post("/reservations", response_model=ReservationOut)
-def create_reservation(
+async def create_reservation(
     reservation: ReservationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    # Validate hall existence
-    hall = db.query(Hall).filter(Hall.id == reservation.hall_id).first()
+    # The hall is validated by create_reservation
+    try:
+        return await crud_reservation.create_reservation(
+            db=db, user_id=current_user.id, res_in=reservation
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+# --- Recurring Series Endpoints ---
+@router.post("/reservation-series", response_model=ReservationSeriesResult)
+async def create_reservation_series(
+    series: ReservationSeriesCreate,
+    dry_run: bool = False,
+    skip_conflicts: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Book a hall on a daily or weekly recurrence, all occurrences in one request.
+
+    Responds with a report of every occurrence. If any occurrence conflicts
+    with an approved reservation nothing is created and the status is 409,
+    unless `skip_conflicts` is set, which creates only the free occurrences.
+    `dry_run` only returns the report.
+    """
+    hall = await crud_reference.get_hall(db, series.hall_id)
     if not hall:
-        logger.error(f"Attempted to create reservation with invalid hall_id {reservation.hall_id}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Selected hall does not exist"
         )
-    
+
     try:
-        return crud_reservation.create_reservation(
-            db=db, user_id=current_user.id, res_in=reservation
+        created, occurrences = await crud_series.create_series(
+            db, user_id=current_user.id, series_in=series, dry_run=dry_run, skip_conflicts=skip_conflicts
         )
     except ValueError as e:
         raise HTTPException(
@@ -56,72 +180,134 @@ def create_reservation(
             detail=str(e)
         )
 
+    result = ReservationSeriesResult(
+        series=ReservationSeriesOut.from_orm(created) if created else None,
+        occurrences=occurrences
+    )
+    if created is None and not dry_run:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=jsonable_encoder(result)
+        )
+    return result
+
+@router.get("/reservation-series/{series_id}", response_model=ReservationSeriesOut)
+async def get_reservation_series(
+    series_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a recurring series; its occurrences are listed by `/reservation-series/{id}/reservations`."""
+    series = await crud_series.get_series(db, series_id)
+    if not series or (series.user_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Series not found"
+        )
+    return series
+
+@router.get("/reservation-series/{series_id}/reservations", response_model=List[ReservationOut])
+async def list_series_reservations(
+    series_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """List the occurrences of a recurring series in date order."""
+    series = await crud_series.get_series(db, series_id)
+    if not series or (series.user_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Series not found"
+        )
+    return await crud_series.get_series_reservations(db, series_id)
+
 @router.get("/reservations", response_model=List[ReservationWithHallOut])
-def list_my_reservations(
-    status: Optional[str] = None,
-    db: Session = Depends(get_db),
+async def list_my_reservations(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    reservations = crud_reservation.get_user_reservations(db, user_id=current_user.id)
+    """List the current user's reservations, newest first.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
+    """
+    try:
+        reservations = await crud_reservation.get_user_reservations(
+            db,
+            user_id=current_user.id,
+            status=status_filter,
+            skip=skip,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    if status:
-        reservations = [r for r in reservations if r.status.value == status]
-        
+    set_next_cursor(response, reservations, limit, crud_reservation.RESERVATION_ORDER)
     return reservations
 
 @router.get("/reservations/past-approved", response_model=List[dict])
-def list_past_approved_reservations(
-    db: Session = Depends(get_db),
+async def list_past_approved_reservations(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get approved reservations for the current user that have ended (for feedback)"""
     from app.models import ReservationStatus
     
-    # Query for all approved reservations for this user
-    reservations = db.query(Reservation).filter(
-        Reservation.user_id == current_user.id,
-        Reservation.status == ReservationStatus.APPROVED
-    ).all()
-    
-    # Filter to include only reservations that have ended
+    # Ended approved reservations of this user, with hall name and feedback
+    # status, in one joined query
     current_time = datetime.now()
-    past_reservations = []
+    result = await db.execute(
+        select(
+            Reservation.id,
+            Reservation.hall_id,
+            Reservation.start_datetime,
+            Reservation.end_datetime,
+            Reservation.description,
+            Hall.name.label("hall_name"),
+            crud_feedback.Feedback.id.label("feedback_id"),
+        )
+        .outerjoin(Hall, Reservation.hall_id == Hall.id)
+        .outerjoin(crud_feedback.Feedback, crud_feedback.Feedback.reservation_id == Reservation.id)
+        .where(
+            Reservation.user_id == current_user.id,
+            Reservation.status == ReservationStatus.APPROVED,
+            Reservation.end_datetime <= current_time
+        )
+    )
     
-    for res in reservations:
-        hall = db.query(Hall).filter(Hall.id == res.hall_id).first()
-        hall_name = hall.name if hall else "Hall Unavailable"
-        hall_status = "active" if hall else "deleted"
-        
-        if not hall:
+    past_reservations = []
+    for res in result.all():
+        if not res.hall_name:
             logger.warning(f"Past approved reservation {res.id} references missing hall_id {res.hall_id}")
         
-        # Check if the reservation has ended
-        if res.end_datetime <= current_time:
-            # Check if feedback was already submitted
-            feedback_exists = db.query(crud_feedback.Feedback).filter(
-                crud_feedback.Feedback.reservation_id == res.id
-            ).first() is not None
-            
-            past_reservations.append({
-                "id": res.id,
-                "hall_id": res.hall_id,
-                "hall_name": hall_name,
-                "hall_status": hall_status,
-                "start_datetime": res.start_datetime,
-                "end_datetime": res.end_datetime,
-                "description": res.description,
-                "feedbackSubmitted": feedback_exists
-            })
+        past_reservations.append({
+            "id": res.id,
+            "hall_id": res.hall_id,
+            "hall_name": res.hall_name or "Hall Unavailable",
+            "hall_status": "active" if res.hall_name else "deleted",
+            "start_datetime": res.start_datetime,
+            "end_datetime": res.end_datetime,
+            "description": res.description,
+            "feedbackSubmitted": res.feedback_id is not None
+        })
     
     return past_reservations
 
 @router.get("/reservations/{reservation_id}", response_model=ReservationWithHallOut)
-def get_reservation(
+async def get_reservation(
     reservation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    reservation = crud_reservation.get_reservation(db, reservation_id=reservation_id)
+    reservation = await crud_reservation.get_reservation(db, reservation_id=reservation_id)
     
     if not reservation or (not current_user.is_admin and reservation.user_id != current_user.id):
         raise HTTPException(
@@ -132,14 +318,14 @@ def get_reservation(
     return reservation
 
 @router.put("/reservations/{reservation_id}", response_model=ReservationOut)
-def update_reservation(
+async def update_reservation(
     reservation_id: int,
     reservation: ReservationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     try:
-        updated_reservation = crud_reservation.update_reservation(
+        updated_reservation = await crud_reservation.update_reservation(
             db=db, 
             reservation_id=reservation_id, 
             res_in=reservation, 
@@ -160,13 +346,13 @@ def update_reservation(
         )
 
 @router.delete("/reservations/{reservation_id}", response_model=ReservationOut)
-def cancel_reservation(
+async def cancel_reservation(
     reservation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     try:
-        cancelled_reservation = crud_reservation.cancel_reservation(
+        cancelled_reservation = await crud_reservation.cancel_reservation(
             db=db, 
             reservation_id=reservation_id, 
             user_id=current_user.id
@@ -185,17 +371,106 @@ def cancel_reservation(
             detail=str(e)
         )
 
+@router.get("/calendar", response_model=List[dict])
+async def get_calendar(
+    request: Request,
+    start_date: datetime = Query(..., description="Start date for calendar view"),
+    end_date: datetime = Query(..., description="End date for calendar view"),
+    hall_id: Optional[int] = Query(None, description="Filter by hall ID"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Read-only calendar of approved reservations, without who booked them or why."""
+    try:
+        calendar = await crud_calendar.get_calendar(db, start_date, end_date, hall_id=hall_id, admin=False)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    headers = validator_headers(calendar.etag, calendar.last_modified)
+    if is_not_modified(request, calendar.etag, calendar.last_modified):
+        return not_modified_response(headers)
+    return Response(content=calendar.body, media_type="application/json", headers=headers)
+
+ICS_MEDIA_TYPE = "text/calendar"
+
+@router.get("/halls/{hall_id}/calendar.ics", response_class=StreamingResponse)
+async def hall_calendar_feed(
+    hall_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """iCalendar feed of a hall's approved reservations, for calendar subscriptions."""
+    hall = await crud_reference.get_hall(db, hall_id)
+    if not hall:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hall not found"
+        )
+    etag = crud_calendar.feed_etag(crud_calendar.hall_feed_key(hall_id))
+    headers = validator_headers(etag, cache_control="no-cache")
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return StreamingResponse(crud_calendar.stream_hall_feed(db, hall), media_type=ICS_MEDIA_TYPE, headers=headers)
+
+@router.get("/me/calendar.ics", response_class=StreamingResponse)
+async def my_calendar_feed(
+    request: Request,
+    token: str = Query(..., description="Calendar token from POST /me/calendar-token"),
+    db: AsyncSession = Depends(get_db)
+):
+    """iCalendar feed of a user's pending and approved reservations.
+
+    Calendar apps cannot send a bearer token, so the feed is authenticated
+    by the secret token in its URL instead.
+    """
+    user_id = await crud_user.get_user_id_by_calendar_token(db, token)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid calendar token"
+        )
+    etag = crud_calendar.feed_etag(crud_calendar.user_feed_key(user_id))
+    headers = validator_headers(etag)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return StreamingResponse(crud_calendar.stream_user_feed(db, user_id), media_type=ICS_MEDIA_TYPE, headers=headers)
+
+@router.post("/me/calendar-token", response_model=CalendarTokenOut)
+async def issue_calendar_token(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Issue a new calendar feed token, revoking the previous one.
+
+    The token is shown only in this response; subscribe to the returned URL.
+    """
+    token = await crud_user.issue_calendar_token(db, current_user.id)
+    url = request.url_for("my_calendar_feed").include_query_params(token=token)
+    return {"token": token, "url": str(url)}
+
+@router.delete("/me/calendar-token", response_model=dict)
+async def revoke_calendar_token(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Revoke the calendar feed token; subscriptions to the feed stop updating."""
+    await crud_user.revoke_calendar_token(db, current_user.id)
+    return {"message": "Calendar token revoked"}
+
 @router.get("/check-availability", response_model=bool)
-def check_availability(
+async def check_availability(
     hall_id: int,
     start_datetime: datetime,
     end_datetime: datetime,
     exclude_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Check if a time slot is available for reservation."""
     # Validate hall existence
-    hall = db.query(Hall).filter(Hall.id == hall_id).first()
+    hall = await crud_reference.get_hall(db, hall_id)
     if not hall:
         logger.error(f"Availability check failed: invalid hall_id {hall_id}")
         raise HTTPException(
@@ -203,7 +478,7 @@ def check_availability(
             detail="Selected hall does not exist"
         )
     
-    is_available = not crud_reservation.is_overlapping(
+    is_available = not await crud_reservation.is_overlapping(
         db, 
         hall_id=hall_id, 
         start_dt=start_datetime, 
@@ -212,14 +487,34 @@ def check_availability(
     )
     return is_available
 
+@router.post("/check-availability/batch", response_model=List[AvailabilitySlotOut])
+async def check_availability_batch(
+    request: AvailabilityBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Check many (hall, time slot) candidates in one call."""
+    missing = await crud_reference.missing_hall_ids(db, {slot.hall_id for slot in request.slots})
+    if missing:
+        logger.error(f"Batch availability check failed: invalid hall_ids {missing}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Selected hall does not exist: {', '.join(map(str, missing))}"
+        )
+
+    conflicts = await crud_reservation.check_slots_availability(db, request.slots)
+    return [
+        AvailabilitySlotOut(**slot.dict(), available=not ids, conflicting_ids=ids)
+        for slot, ids in zip(request.slots, conflicts)
+    ]
+
 # --- Feedback Endpoints ---
 @router.post("/feedback", response_model=FeedbackOut)
-def create_feedback(
+async def create_feedback(
     feedback: FeedbackCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    db_feedback = crud_feedback.create_feedback(
+    db_feedback = await crud_feedback.create_feedback(
         db=db, 
         feedback_in=feedback, 
         user_id=current_user.id
@@ -232,24 +527,21 @@ def create_feedback(
         )
         
     # Create notification for admin about new feedback
-    admin_notification = crud_notification.create_notification(
-        db=db,
-        notification_in={
-            "user_id": None,  # For all admins
-            "message": f"New feedback received for reservation #{feedback.reservation_id}"
-        }
+    await crud_notification.create_admin_notification(
+        db,
+        message=f"New feedback received for reservation #{feedback.reservation_id}"
     )
     
     return db_feedback
 
 @router.get("/feedback/reservation/{reservation_id}", response_model=List[FeedbackWithReservationOut])
-def get_feedback_by_reservation(
+async def get_feedback_by_reservation(
     reservation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get feedback for a specific reservation. Only the reservation owner or an admin can access."""
-    feedbacks = crud_feedback.get_feedbacks_by_reservation(db, reservation_id=reservation_id)
+    feedbacks = await crud_feedback.get_feedbacks_by_reservation(db, reservation_id=reservation_id)
     
     if not feedbacks:
         raise HTTPException(
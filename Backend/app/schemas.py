@@ -1,8 +1,8 @@
-from pydantic import BaseModel, EmailStr, validator, Field
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, validator, root_validator, Field
+from datetime import date, datetime
 from typing import List, Optional
 
-from app.models import ReservationStatus
+from app.models import RecurrenceFrequency, ReservationStatus
 
 # --- Auth and Users ---
 class UserBase(BaseModel):
@@ -38,6 +38,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+class CalendarTokenOut(BaseModel):
+    token: str
+    url: str
+
 class TokenData(BaseModel):
     user_id: Optional[int] = None
     is_admin: bool = False
@@ -106,6 +110,158 @@ class ReservationWithHallOut(ReservationOut):
     class Config:
         orm_mode = True
 
+class AvailabilitySlot(BaseModel):
+    hall_id: int
+    start_datetime: datetime
+    end_datetime: datetime
+    exclude_id: Optional[int] = None
+
+    @validator('end_datetime')
+    def end_must_after_start(cls, v, values):
+        if 'start_datetime' in values and v <= values['start_datetime']:
+            raise ValueError('End time must be after start time')
+        return v
+
+class AvailabilityBatchRequest(BaseModel):
+    slots: List[AvailabilitySlot] = Field(..., max_items=1000)
+
+class AvailabilitySlotOut(AvailabilitySlot):
+    available: bool
+    conflicting_ids: List[int] = []
+
+class FreeSlotOut(BaseModel):
+    start_datetime: datetime
+    end_datetime: datetime
+
+class HallFreeSlotsOut(BaseModel):
+    hall_id: int
+    hall_name: str
+    capacity: Optional[int] = None
+    free_slots: List[FreeSlotOut] = []
+
+# --- Recurring series ---
+class ReservationSeriesBase(ReservationBase):
+    frequency: RecurrenceFrequency
+    interval: int = Field(1, ge=1, le=52)
+    weekdays: Optional[List[int]] = None  # WEEKLY only: 0 = Monday ... 6 = Sunday
+    until: Optional[datetime] = None
+    count: Optional[int] = Field(None, ge=1)
+    exdates: List[date] = []
+
+    @validator('weekdays')
+    def weekdays_in_range(cls, v):
+        if v is not None and any(day < 0 or day > 6 for day in v):
+            raise ValueError('Weekdays must be between 0 (Monday) and 6 (Sunday)')
+        return v
+
+class ReservationSeriesCreate(ReservationSeriesBase):
+    resource_ids: List[int] = []
+
+    @root_validator(skip_on_failure=True)
+    def bounded(cls, values):
+        if values.get('until') is None and values.get('count') is None:
+            raise ValueError("Either 'until' or 'count' is required")
+        if values.get('weekdays') and values.get('frequency') != RecurrenceFrequency.WEEKLY:
+            raise ValueError("'weekdays' only applies to WEEKLY series")
+        return values
+
+class ReservationSeriesOut(ReservationSeriesBase):
+    id: int
+    user_id: Optional[int]  # None once the owner is deleted
+    created_at: datetime
+
+    @validator('exdates', pre=True)
+    def no_exdates(cls, v):
+        return v or []
+
+    class Config:
+        orm_mode = True
+
+class SeriesOccurrenceOut(BaseModel):
+    start_datetime: datetime
+    end_datetime: datetime
+    available: bool
+    conflicting_ids: List[int] = []
+    reservation_id: Optional[int] = None  # set once the occurrence was created
+
+class ReservationSeriesResult(BaseModel):
+    series: Optional[ReservationSeriesOut] = None  # None for a dry run or when nothing was created
+    occurrences: List[SeriesOccurrenceOut]
+
+# Resolved now: the ReservationStatus name is reused by a schema further down
+APPROVED, DENIED = ReservationStatus.APPROVED, ReservationStatus.DENIED
+
+class ReservationDecision(BaseModel):
+    reservation_id: int
+    status: ReservationStatus  # APPROVED or DENIED
+    admin_message: Optional[str] = None
+
+    @validator('status')
+    def approve_or_deny(cls, v):
+        if v not in (APPROVED, DENIED):
+            raise ValueError('Status must be APPROVED or DENIED')
+        return v
+
+    @validator('admin_message', always=True)
+    def deny_needs_reason(cls, v, values):
+        if values.get('status') == DENIED and not v:
+            raise ValueError('A denial needs an admin_message')
+        return v
+
+class BulkDecisionRequest(BaseModel):
+    decisions: List[ReservationDecision] = Field(..., min_items=1, max_items=1000)
+
+    @validator('decisions')
+    def unique_reservations(cls, v):
+        seen = set()
+        for decision in v:
+            if decision.reservation_id in seen:
+                raise ValueError(f'Reservation {decision.reservation_id} appears more than once')
+            seen.add(decision.reservation_id)
+        return v
+
+class DecisionOutcomeOut(BaseModel):
+    reservation_id: int
+    applied: bool
+    status: Optional[ReservationStatus] = None  # the reservation's status afterwards
+    error: Optional[str] = None
+    conflicting_ids: List[int] = []
+
+class BulkDecisionResult(BaseModel):
+    approved: int
+    denied: int
+    rejected: int
+    outcomes: List[DecisionOutcomeOut]
+
+class AutoScheduleRequest(BaseModel):
+    start_datetime: datetime
+    end_datetime: datetime
+    weight: str = Field("count", regex="^(count|age|duration)$")
+    plan_id: Optional[str] = None  # from the preview; applying fails if the plan changed since
+    deny_message: Optional[str] = None
+
+    @validator('end_datetime')
+    def end_must_after_start(cls, v, values):
+        if 'start_datetime' in values and v <= values['start_datetime']:
+            raise ValueError('End time must be after start time')
+        return v
+
+class ScheduledReservationOut(BaseModel):
+    reservation_id: int
+    user_id: Optional[int] = None
+    start_datetime: datetime
+    end_datetime: datetime
+    created_at: Optional[datetime] = None
+    conflicting_ids: List[int] = []  # for a denial: the reservations it loses to
+
+class AutoSchedulePlanOut(BaseModel):
+    hall_id: int
+    weight: str
+    plan_id: str
+    approve: List[ScheduledReservationOut]
+    deny: List[ScheduledReservationOut]
+    applied: bool
+
 class ReservationStatus(BaseModel):
     status: ReservationStatus
     admin_message: Optional[str] = None
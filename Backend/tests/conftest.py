@@ -0,0 +1,48 @@
+import asyncio
+import os
+import tempfile
+
+# The app binds its engine to DATABASE_URL on import, so this runs first
+_db_dir = tempfile.mkdtemp(prefix="hall-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+
+from app.core.config import settings
+from app.core.intervals import HallIntervalIndex
+from app.core.locks import StripedLock
+from app.crud import crud_reservation
+from app.db.migrations import run_migrations, schema_version
+from app.db.session import Base, engine
+
+
+def run(coro):
+    """Run `coro` on a fresh event loop and close the engine's connections after it.
+
+    aiosqlite connections belong to the loop that opened them.
+    """
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+    return asyncio.run(wrapper())
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Empty, fully migrated tables and fresh in-process approval state."""
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(schema_version.drop, checkfirst=True)
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+    run(reset())
+    # asyncio locks bind to the first loop that waits on them; each test runs its own
+    monkeypatch.setattr(crud_reservation, "hall_locks", StripedLock(settings.HALL_LOCK_STRIPES))
+    monkeypatch.setattr(crud_reservation, "_index_reload_lock", asyncio.Lock())
+    monkeypatch.setattr(crud_reservation, "approved_index", HallIntervalIndex())
+    yield engine
@@ -0,0 +1,37 @@
+from app.core.deps import user_cache
+from app.db.session import SessionLocal
+from app.models import User
+
+from conftest import run
+
+
+def test_user_changes_evict_the_cached_row_on_commit(database):
+    async def scenario():
+        async with SessionLocal() as db:
+            user = User(email="student@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+
+            user.is_admin = True
+            await db.flush()
+            # a concurrent request reads the old row between flush and commit
+            user_cache.set(user.id, "old row")
+            await db.commit()
+            return user.id
+
+    user_id = run(scenario())
+    assert user_cache.get(user_id) is None
+
+
+def test_rolled_back_changes_leave_nothing_pending(database):
+    async def scenario():
+        async with SessionLocal() as db:
+            user = User(email="student@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+            user.full_name = "Changed"
+            await db.flush()
+            await db.rollback()
+            return dict(db.info)
+
+    assert run(scenario()) == {}
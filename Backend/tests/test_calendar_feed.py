@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.core.security import create_access_token
+from app.crud import crud_calendar
+from app.db.session import SessionLocal
+from app.main import app
+from app.models import Hall, HallName, Reservation, ReservationStatus, User
+
+from conftest import run
+
+
+async def seed():
+    """A hall with an upcoming approved reservation of a student, and a second student without one."""
+    async with SessionLocal() as db:
+        student, other = User(email="student@example.com", password_hash="x"), User(email="other@example.com", password_hash="x")
+        hall = Hall(name=list(HallName)[0].value, capacity=100)
+        db.add_all([student, other, hall])
+        await db.flush()
+        start = datetime.now().replace(microsecond=0) + timedelta(days=2)
+        db.add(Reservation(
+            user_id=student.id,
+            hall_id=hall.id,
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+            status=ReservationStatus.APPROVED,
+            description="Rehearsal",
+        ))
+        await db.commit()
+        return student.id, other.id, hall.id
+
+
+def test_feed_is_authenticated_by_a_revocable_url_token(database):
+    student_id, _, _ = run(seed())
+    bearer = {"Authorization": f"Bearer {create_access_token({'sub': str(student_id)})}"}
+
+    with TestClient(app) as client:
+        issued = client.post("/me/calendar-token", headers=bearer).json()
+        assert issued["url"].endswith(f"/me/calendar.ics?token={issued['token']}")
+
+        feed = client.get(issued["url"])
+        assert feed.status_code == 200
+        assert feed.headers["content-type"].startswith("text/calendar")
+        assert "Rehearsal" in feed.text
+
+        # a bearer token alone does not open the feed
+        assert client.get("/me/calendar.ics", headers=bearer).status_code == 422
+        assert client.get("/me/calendar.ics", params={"token": "guess"}).status_code == 401
+
+        reissued = client.post("/me/calendar-token", headers=bearer).json()
+        assert client.get(issued["url"]).status_code == 401
+        assert client.get(reissued["url"]).status_code == 200
+
+        assert client.delete("/me/calendar-token", headers=bearer).status_code == 200
+        assert client.get(reissued["url"]).status_code == 401
+    run(database.dispose())
+
+
+def test_hall_rename_changes_the_feeds_that_show_the_hall(database):
+    student_id, other_id, hall_id = run(seed())
+    student_etag = crud_calendar.feed_etag(crud_calendar.user_feed_key(student_id))
+    other_etag = crud_calendar.feed_etag(crud_calendar.user_feed_key(other_id))
+
+    async def rename():
+        async with SessionLocal() as db:
+            hall = await db.get(Hall, hall_id)
+            hall.name = list(HallName)[1].value
+            await db.commit()
+    run(rename())
+
+    assert crud_calendar.feed_etag(crud_calendar.user_feed_key(student_id)) != student_etag
+    assert crud_calendar.feed_etag(crud_calendar.user_feed_key(other_id)) == other_etag
@@ -0,0 +1,101 @@
+"""Admins approving overlapping requests at the same time never double-book a hall."""
+import asyncio
+from datetime import datetime, timedelta
+import random
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import aliased
+
+from app.crud import crud_reservation
+from app.db.session import SessionLocal, engine
+from app.models import Hall, HallName, Reservation, ReservationStatus, User
+from app.schemas import ReservationDecision
+
+from conftest import run
+
+CLUSTERS = 20
+CLUSTER_SIZE = 4
+BATCH = 5
+
+
+async def seed() -> list:
+    """PENDING requests for one hall, in clusters whose members all overlap each other."""
+    async with engine.begin() as conn:
+        await conn.execute(User.__table__.insert(), [
+            {"id": 1, "email": "admin@example.com", "password_hash": "x", "is_admin": True},
+            {"id": 2, "email": "student@example.com", "password_hash": "x", "is_admin": False},
+        ])
+        await conn.execute(Hall.__table__.insert(), [{"id": 1, "name": list(HallName)[0].value, "capacity": 100}])
+        base = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=7)
+        rows = []
+        for cluster in range(CLUSTERS):
+            slot = base + timedelta(hours=2 * cluster)
+            for member in range(CLUSTER_SIZE):
+                start = slot + timedelta(minutes=10 * member)
+                rows.append({
+                    "user_id": 2,
+                    "hall_id": 1,
+                    "start_datetime": start,
+                    "end_datetime": start + timedelta(minutes=60),
+                    "status": ReservationStatus.PENDING,
+                    "created_at": base,
+                })
+        await conn.execute(Reservation.__table__.insert(), rows)
+    async with SessionLocal() as db:
+        return (await db.execute(select(Reservation.id))).scalars().all()
+
+
+async def approve_one(reservation_id: int):
+    async with SessionLocal() as db:
+        try:
+            await crud_reservation.approve_reservation(db, reservation_id, admin_id=1)
+        except ValueError:
+            pass  # overlaps a request approved meanwhile
+
+
+async def approve_batch(reservation_ids: list):
+    async with SessionLocal() as db:
+        await crud_reservation.decide_reservations(db, [
+            ReservationDecision(reservation_id=reservation_id, status=ReservationStatus.APPROVED)
+            for reservation_id in reservation_ids
+        ], admin_id=1)
+
+
+async def approved_overlaps() -> int:
+    a, b = aliased(Reservation), aliased(Reservation)
+    async with SessionLocal() as db:
+        return await db.scalar(
+            select(func.count()).select_from(a).join(b, and_(
+                a.hall_id == b.hall_id,
+                a.id < b.id,
+                a.start_datetime < b.end_datetime,
+                a.end_datetime > b.start_datetime,
+            )).where(a.status == ReservationStatus.APPROVED, b.status == ReservationStatus.APPROVED)
+        )
+
+
+async def approved_count() -> int:
+    async with SessionLocal() as db:
+        return await db.scalar(
+            select(func.count()).select_from(Reservation).where(Reservation.status == ReservationStatus.APPROVED)
+        )
+
+
+def test_parallel_approvals_approve_one_request_per_slot(database):
+    async def scenario():
+        ids = await seed()
+        random.Random(7).shuffle(ids)
+        approvals = []
+        # single approvals and batches, interleaved, all racing for the same slots
+        for offset in range(0, len(ids), BATCH):
+            chunk = ids[offset:offset + BATCH]
+            if offset // BATCH % 2:
+                approvals.append(approve_batch(chunk))
+            else:
+                approvals.extend(approve_one(reservation_id) for reservation_id in chunk)
+        await asyncio.gather(*approvals)
+        return await approved_overlaps(), await approved_count()
+
+    overlaps, approved = run(scenario())
+    assert overlaps == 0
+    assert approved == CLUSTERS
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from app.core.intervals import HallIntervalIndex
+
+T0 = datetime(2030, 1, 1, 8)
+
+
+def hours(n: float) -> datetime:
+    return T0 + timedelta(hours=n)
+
+
+def test_reload_keeps_changes_made_while_its_query_ran():
+    index = HallIntervalIndex()
+    index.load([(1, 1, hours(0), hours(1)), (2, 1, hours(2), hours(3))])
+
+    generation = index.begin_load()
+    # the reload's SELECT saw 1 and 2; meanwhile 3 was approved and 2 cancelled
+    index.add(3, 1, hours(4), hours(5))
+    index.discard(2)
+    index.load([(1, 1, hours(0), hours(1)), (2, 1, hours(2), hours(3))], generation=generation)
+
+    assert index.find_overlaps(1, hours(0), hours(6)) == [1, 3]
+
+
+def test_superseded_load_is_dropped():
+    index = HallIntervalIndex()
+    index.load([(1, 1, hours(0), hours(1))])
+    old = index.begin_load()
+    new = index.begin_load()
+    index.load([(2, 1, hours(0), hours(1))], generation=new)
+    index.load([], generation=old)
+
+    assert index.find_overlaps(1, hours(0), hours(1)) == [2]
+
+
+def test_max_span_shrinks_when_the_longest_interval_goes():
+    index = HallIntervalIndex()
+    index.load([(1, 1, hours(0), hours(24 * 30)), (2, 1, hours(1), hours(2)), (3, 1, hours(3), hours(5))])
+    intervals = index._halls[1]
+    assert intervals.max_span == timedelta(days=30)
+
+    index.discard(1)
+    assert intervals.max_span == timedelta(hours=2)
+    assert index.find_overlaps(1, hours(4), hours(6)) == [3]
+
+
+def test_covers_only_slots_after_the_horizon():
+    index = HallIntervalIndex()
+    assert not index.covers(hours(0))
+    index.load([], horizon=hours(10))
+    assert not index.covers(hours(9))
+    assert index.covers(hours(10))
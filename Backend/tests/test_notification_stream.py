@@ -0,0 +1,34 @@
+import json
+
+from app.core.pubsub import notification_hub
+from app.crud import crud_notification
+from app.db.session import SessionLocal
+from app.models import User
+from app.routers.notifications import _notification_events
+
+from conftest import run
+
+
+def test_stream_holds_its_subscription_only_while_iterated(database):
+    async def scenario():
+        async with SessionLocal() as db:
+            user = User(email="student@example.com", password_hash="x", unread_notifications=2)
+            db.add(user)
+            await db.commit()
+            user_id = user.id
+
+        # a response that is never iterated subscribes to nothing
+        _notification_events(user_id, (crud_notification.ADMINS_TOPIC,))
+        assert notification_hub._subscriptions == {}
+
+        events = _notification_events(user_id, (crud_notification.ADMINS_TOPIC,))
+        first = await events.__anext__()
+        subscribed = set(notification_hub._subscriptions)
+        await events.aclose()
+        return first, subscribed, dict(notification_hub._subscriptions)
+
+    first, subscribed, after = run(scenario())
+    assert first.startswith("event: unread_count\n")
+    assert json.loads(first.split("data: ")[1]) == {"unread_count": 2}
+    assert len(subscribed) == 2
+    assert after == {}
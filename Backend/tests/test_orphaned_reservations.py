@@ -0,0 +1,44 @@
+"""Reservations whose owner was deleted (user_id SET NULL) can still be decided."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.crud import crud_reservation
+from app.db.session import SessionLocal, engine
+from app.models import Hall, HallName, Notification, Reservation, ReservationStatus, User
+
+from conftest import run
+
+
+async def seed():
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+    async with engine.begin() as conn:
+        await conn.execute(User.__table__.insert(), [
+            {"id": 1, "email": "admin@example.com", "password_hash": "x", "is_admin": True},
+        ])
+        await conn.execute(Hall.__table__.insert(), [{"id": 1, "name": list(HallName)[0].value, "capacity": 100}])
+        await conn.execute(Reservation.__table__.insert(), [
+            {
+                "id": i,
+                "user_id": None,
+                "hall_id": 1,
+                "start_datetime": start + timedelta(hours=2 * i),
+                "end_datetime": start + timedelta(hours=2 * i + 1),
+                "status": ReservationStatus.PENDING,
+            }
+            for i in (1, 2)
+        ])
+
+
+def test_reservations_of_deleted_users_can_be_approved_and_denied(database):
+    async def scenario():
+        await seed()
+        async with SessionLocal() as db:
+            approved = await crud_reservation.approve_reservation(db, 1, admin_id=1)
+        async with SessionLocal() as db:
+            denied = await crud_reservation.deny_reservation(db, 2, admin_id=1, admin_message="Closed")
+        async with SessionLocal() as db:
+            notifications = await db.scalar(select(func.count()).select_from(Notification))
+        return approved.status, denied.status, notifications
+
+    assert run(scenario()) == (ReservationStatus.APPROVED, ReservationStatus.DENIED, 0)
@@ -0,0 +1,104 @@
+"""The list endpoints run a fixed number of statements, however many rows they return."""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.deps import token_cache, user_cache
+from app.core.security import create_access_token
+from app.crud import crud_calendar, crud_reference
+from app.db.session import engine
+from app.main import app
+from app.models import Feedback, Hall, HallName, Reservation, ReservationStatus, Resource, User, reservation_resources
+
+from conftest import run
+
+STUDENT_ID, ADMIN_ID = 1, 2
+HALLS = 3
+WINDOW_DAYS = 60
+
+
+async def seed(first: int, count: int):
+    """Add `count` ended, approved reservations of the student, from id `first` on.
+
+    Each one has a resource and every other one has feedback, so each
+    relation a per-row lookup could load is populated.
+    """
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    async with engine.begin() as conn:
+        if first == 1:
+            await conn.execute(User.__table__.insert(), [
+                {"id": STUDENT_ID, "email": "student@example.com", "password_hash": "x", "is_admin": False},
+                {"id": ADMIN_ID, "email": "admin@example.com", "password_hash": "x", "is_admin": True},
+            ])
+            await conn.execute(Hall.__table__.insert(), [
+                {"id": i, "name": name, "capacity": 100} for i, name in enumerate(list(HallName)[:HALLS], 1)
+            ])
+            await conn.execute(Resource.__table__.insert(), [{"id": 1, "name": "Projector"}])
+        ids = range(first, first + count)
+        rows = []
+        for i in ids:
+            start = now - timedelta(days=1 + i % (WINDOW_DAYS - 2), hours=i % 12)
+            rows.append({
+                "id": i,
+                "user_id": STUDENT_ID,
+                "hall_id": 1 + i % HALLS,
+                "start_datetime": start,
+                "end_datetime": start + timedelta(minutes=30),
+                "status": ReservationStatus.APPROVED,
+                "created_at": start - timedelta(days=7),
+            })
+        await conn.execute(Reservation.__table__.insert(), rows)
+        await conn.execute(reservation_resources.insert(), [{"reservation_id": i, "resource_id": 1} for i in ids])
+        await conn.execute(Feedback.__table__.insert(), [
+            {"reservation_id": i, "rating": 5} for i in ids if i % 2
+        ])
+
+
+def statements_run(client: TestClient, path: str, user_id: int, is_admin: bool, **params) -> int:
+    """Statements one cold request to `path` executes."""
+    # Start from the same cold caches on every call, so only the rows differ
+    token_cache.clear()
+    user_cache.clear()
+    crud_reference.invalidate()
+    crud_calendar.calendar_cache.clear()
+    token = create_access_token({"sub": str(user_id), "is_admin": is_admin})
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = client.get(path, params=params, headers={"Authorization": f"Bearer {token}"})
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.text
+    assert response.json()
+    return len(statements)
+
+
+ENDPOINTS = {
+    "/admin/reservations": (ADMIN_ID, True, {}),
+    "/admin/calendar": (ADMIN_ID, True, {
+        "start_date": (datetime.now() - timedelta(days=WINDOW_DAYS)).isoformat(),
+        "end_date": datetime.now().isoformat(),
+    }),
+    "/reservations/past-approved": (STUDENT_ID, False, {}),
+}
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_statement_count_does_not_grow_with_rows(database, path):
+    user_id, is_admin, params = ENDPOINTS[path]
+    run(seed(1, 10))
+    with TestClient(app) as client:
+        few = statements_run(client, path, user_id, is_admin, **params)
+    run(seed(11, 90))
+    with TestClient(app) as client:
+        many = statements_run(client, path, user_id, is_admin, **params)
+    run(engine.dispose())
+
+    assert many == few
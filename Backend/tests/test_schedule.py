@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud import crud_schedule
+from app.db.session import SessionLocal, engine
+from app.models import Hall, HallName, Reservation, ReservationStatus, User
+
+from conftest import run
+
+START = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=5)
+
+
+async def plan(created_at: dict, weight: str):
+    """Plan two overlapping PENDING requests (ids 1 and 2) created at `created_at[id]`."""
+    async with engine.begin() as conn:
+        await conn.execute(User.__table__.insert(), [{"id": 1, "email": "student@example.com", "password_hash": "x"}])
+        await conn.execute(Hall.__table__.insert(), [{"id": 1, "name": list(HallName)[0].value, "capacity": 100}])
+        await conn.execute(Reservation.__table__.insert(), [
+            {
+                "id": i,
+                "user_id": 1,
+                "hall_id": 1,
+                "start_datetime": START + timedelta(minutes=30 * i),
+                "end_datetime": START + timedelta(minutes=30 * i + 60),
+                "status": ReservationStatus.PENDING,
+                "created_at": created_at[i],
+            }
+            for i in (1, 2)
+        ])
+    async with SessionLocal() as db:
+        return await crud_schedule.plan_schedule(db, 1, START, START + timedelta(days=1), weight)
+
+
+@pytest.mark.parametrize("weight", crud_schedule.SCHEDULE_WEIGHTS)
+def test_requests_without_created_at_can_be_planned(database, weight):
+    # legacy rows have no created_at; they count as old as the oldest request
+    result = run(plan({1: datetime.now() - timedelta(days=1), 2: None}, weight))
+    assert len(result["approve"]) == 1 and len(result["deny"]) == 1
+
+
+def test_plan_without_any_created_at(database):
+    result = run(plan({1: None, 2: None}, "age"))
+    assert len(result["approve"]) == 1 and len(result["deny"]) == 1